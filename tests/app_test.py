@@ -2,11 +2,14 @@
 """Tests for the main file app.py for vimiv's test suite."""
 
 import os
+import shutil
 import sys
+import tempfile
 from unittest import main
 
 from gi.repository import GLib
 from vimiv.app import Vimiv
+from vimiv.thumbnail_manager import ThumbnailStore
 
 from vimiv_testcase import VimivTestCase, refresh_gui
 
@@ -50,6 +53,18 @@ class AppTest(VimivTestCase):
                                2.2)
         self.assertEqual(self.settings["geometry"].get_value(), (400, 400))
 
+    def test_generate_thumbnails(self):
+        """Generate thumbnails of the paths given on the commandline."""
+        directory = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        image = os.path.join(directory.name, "arch-logo.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", image)
+        returncode = Vimiv(True).run(
+            ["vimiv", "--generate-thumbnails", directory.name])
+        self.assertEqual(returncode, 0)
+        self.assertIsNotNone(
+            ThumbnailStore().get_thumbnail(image, create=False))
+        directory.cleanup()
+
     def test_temp_basedir(self):
         """Using a temporary basedir."""
         # XDG_*_HOME directories should be in tmp
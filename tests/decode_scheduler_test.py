@@ -0,0 +1,55 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test decode_scheduler.py for vimiv's test suite."""
+
+from threading import Event
+from unittest import TestCase, main
+
+from vimiv.decode_scheduler import DecodeScheduler
+
+
+class DecodeSchedulerTest(TestCase):
+    """Test the bounded decode scheduler."""
+
+    def setUp(self):
+        self.scheduler = DecodeScheduler()
+        self.scheduler.MAX_WORKERS = 1
+        self.done = []
+        self.finished = Event()
+
+    def _block(self, job, event):
+        event.wait()
+
+    def _decode(self, job, name):
+        self.done.append(name)
+
+    def _finish(self, job):
+        self.finished.set()
+
+    def test_priority(self):
+        """Decode the current image before prefetching neighbours."""
+        release = Event()
+        self.scheduler.submit(self._block, release)
+        self.scheduler.submit(self._decode, "prefetch")
+        self.scheduler.submit(self._decode, "current",
+                              priority=DecodeScheduler.CURRENT)
+        self.scheduler.submit(self._finish)
+        release.set()
+        self.assertTrue(self.finished.wait(5))
+        self.assertEqual(self.done, ["current", "prefetch"])
+
+    def test_cancel(self):
+        """Skip cancelled jobs."""
+        release = Event()
+        self.scheduler.submit(self._block, release)
+        superseded = self.scheduler.submit(self._decode, "superseded")
+        self.scheduler.submit(self._decode, "current")
+        self.scheduler.submit(self._finish)
+        superseded.cancel()
+        release.set()
+        self.assertTrue(self.finished.wait(5))
+        self.assertEqual(self.done, ["current"])
+        self.assertFalse(superseded.started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test frame_cache.py for vimiv's test suite."""
+
+import os
+import tempfile
+from unittest import TestCase, main
+
+from gi import require_version
+require_version("Gdk", "3.0")
+require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf
+from vimiv.frame_cache import FrameCache, count_gif_frames
+from vimiv.settings import settings
+
+
+class FrameCacheTest(TestCase):
+    """Test the cache of pre-scaled animation frames."""
+
+    def setUp(self):
+        self.cache = FrameCache()
+        self.frames = []
+        for color in [0x875FFFFF, 0xFFFFFFFF]:
+            frame = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8,
+                                         100, 50)
+            frame.fill(color)
+            self.frames.append(frame)
+
+    def test_loop(self):
+        """Play later loops from the cache."""
+        first = self._get(0, 50, 25)
+        second = self._get(1, 50, 25)
+        self.assertEqual(first.get_width(), 50)
+        self.assertIsNot(first, second)
+        self.assertIs(self._get(0, 50, 25), first)
+        # Frames are recognized by their index as the pixbuf may be reused
+        self.cache.set_frame(self.frames[0], 1)
+        self.assertIs(self.cache.get(50, 25), second)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_unknown_index(self):
+        """Scale frames with an unknown index every time."""
+        self.cache.set_frame(self.frames[0], None)
+        surface = self.cache.get(50, 25)
+        self.assertIsNot(self.cache.get(50, 25), surface)
+        self.assertFalse(len(self.cache))
+
+    def test_count_gif_frames(self):
+        """Count the frames of a gif from its block structure."""
+        frame = (b"!\xf9\x04\x00\x0a\x00\x00\x00"  # Graphic control
+                 b",\x00\x00\x00\x00\x01\x00\x01\x00\x00"
+                 b"\x02\x02\x44\x01\x00")
+        gif = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00"
+               b"\x00\x00\x00\xff\xff\xff" + 3 * frame + b";")
+        tmpdir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        filename = os.path.join(tmpdir.name, "animation.gif")
+        with open(filename, "wb") as f:
+            f.write(gif)
+        self.assertEqual(count_gif_frames(filename), 3)
+        with open(filename, "wb") as f:
+            f.write(gif[:-10])
+        self.assertIsNone(count_gif_frames(filename))
+        tmpdir.cleanup()
+
+    def test_resize(self):
+        """Rebuild the cache when the displayed size changes."""
+        self._get(0, 50, 25)
+        surface = self.cache.get(200, 100)
+        self.assertEqual(surface.get_width(), 200)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_budget(self):
+        """Do not cache frames exceeding the budget."""
+        settings.override("animation_cache_mb", "0")
+        self._get(0, 50, 25)
+        self.assertFalse(len(self.cache))
+        settings.override("animation_cache_mb", None)
+
+    def _get(self, index, width, height):
+        self.cache.set_frame(self.frames[index], index)
+        return self.cache.get(width, height)
+
+
+if __name__ == "__main__":
+    main()
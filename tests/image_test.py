@@ -177,6 +177,64 @@ class ImageTest(VimivTestCase):
         self.assertGreater(self.image.get_zoom_percent(), 100)
         self.image.move_pos(forward=False)
 
+    def test_decode_scale(self):
+        """Decode large images at the resolution needed to fit them."""
+        # Image larger than the window is decoded reduced
+        window_width = self.vimiv["window"].get_size()[0]
+        scale = self.image.get_decode_scale(1920, 1080)
+        self.assertAlmostEqual(scale, window_width / 1920)
+        # Small images and user zoom are decoded at full resolution
+        self.assertEqual(self.image.get_decode_scale(16, 16), 1)
+        self.assertEqual(self.image.get_decode_scale(1920, 1080, "user"), 1)
+        # Full resolution is available on demand
+        self.assertEqual(self.image.get_original_size()[0], 1920)
+        self.assertEqual(self.image.get_pixbuf_original().get_width(), 1920)
+
+    def test_quality(self):
+        """Draw fast during interaction and in high quality when idle."""
+        self.image.zoom_delta()
+        self.assertTrue(self.image._fast)
+        refresh_gui(0.3)
+        self.assertFalse(self.image._fast)
+        # Opened images are drawn in high quality right away
+        self.image.load()
+        refresh_gui()
+        self.assertFalse(self.image._fast)
+        # Always draw in high quality
+        self.settings.override("quality_delay", "0")
+        self.image.zoom_delta(zoom_in=False)
+        self.assertFalse(self.image._fast)
+        self.settings.override("quality_delay", None)
+
+    def test_transformation_matrix(self):
+        """Apply rotations and flips when drawing."""
+        self.image._transformations = [("rotate", 1), ("flip", 1)]
+        self.assertEqual(self.image.get_original_size(), (1080, 1920))
+        matrix = self.image._get_matrix(200, 100, 0.5)
+        # Rotated counter-clockwise and flipped horizontally
+        self.assertEqual(matrix.transform_point(0, 0), (50, 100))
+        self.assertEqual(matrix.transform_point(200, 100), (0, 0))
+        self.image._transformations = []
+        self.assertEqual(self.image.get_original_size(), (1920, 1080))
+
+    def test_read_chunks(self):
+        """Stream image files in chunks."""
+        path = self.vimiv.get_path()
+        with open(path, "rb") as f:
+            expected = f.read()
+        self.image.CHUNK_SIZE = 1024
+        with open(path, "rb") as f:
+            chunks = list(self.image._read_chunks(f))
+        self.assertEqual(len(chunks[0]), 1024)
+        self.assertEqual(b"".join(chunks), expected)
+        # Large files are mapped into memory
+        self.image.MMAP_THRESHOLD = 0
+        with open(path, "rb") as f:
+            chunks = list(self.image._read_chunks(f))
+        self.assertEqual(b"".join(chunks), expected)
+        del self.image.CHUNK_SIZE
+        del self.image.MMAP_THRESHOLD
+
 
 if __name__ == "__main__":
     main()
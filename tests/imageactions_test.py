@@ -4,14 +4,14 @@
 import os
 import shutil
 import time
-from unittest import TestCase, main
+from unittest import TestCase, main, skipUnless
 
 import vimiv.imageactions as imageactions
 from gi import require_version
 require_version('GdkPixbuf', '2.0')
 from gi.repository import GdkPixbuf
 
-from vimiv_testcase import compare_files
+from vimiv_testcase import compare_files, create_jpeg_with_preview, is_blue
 
 
 class ImageActionsTest(TestCase):
@@ -93,6 +93,19 @@ class ImageActionsTest(TestCase):
     def _on_autorotate_completed(self, autorotate, amount):
         self._waiting = False
 
+    @skipUnless(imageactions._has_exif, "Needs exif support")
+    def test_exif_preview(self):
+        """Only return previews which are large enough."""
+        self.assertIsNone(imageactions.get_exif_preview(self.orig, 100000))
+        filename = os.path.abspath("image_with_preview.jpg")
+        create_jpeg_with_preview(filename, (300, 150))
+        preview = imageactions.get_exif_preview(filename, 128)
+        self.assertEqual((preview.get_width(), preview.get_height()),
+                         (300, 150))
+        self.assertTrue(is_blue(preview))
+        self.assertIsNone(imageactions.get_exif_preview(filename, 301))
+        os.remove(filename)
+
     def tearDown(self):
         os.chdir(self.working_directory)
         os.remove(self.filename)
@@ -0,0 +1,122 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test pixbuf_cache.py for vimiv's test suite."""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+
+from gi import require_version
+require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf
+from vimiv.pixbuf_cache import PixbufCache, get_file_key
+from vimiv.settings import settings
+
+
+class PixbufCacheTest(TestCase):
+    """Test the least recently used cache of decoded images."""
+
+    def setUp(self):
+        self.cache = PixbufCache()
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tmpdir.name, "image_%d.png" % (i))
+            shutil.copyfile("vimiv/testimages/arch-logo.png", path)
+            self.paths.append(path)
+        self.pixbuf = GdkPixbuf.Pixbuf.new_from_file(self.paths[0])
+
+    def test_hit_and_miss(self):
+        """Receive images from the cache."""
+        self.assertIsNone(self.cache.get(self.paths[0]))
+        self.cache.add(self.paths[0], get_file_key(self.paths[0]),
+                       self.pixbuf)
+        self.assertEqual(self.cache.get(self.paths[0]), self.pixbuf)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_stale_entry(self):
+        """Do not return images of files which changed."""
+        key = get_file_key(self.paths[0])
+        self.cache.add(self.paths[0], key, self.pixbuf)
+        os.utime(self.paths[0], ns=(key[0] + 10**9, key[0] + 10**9))
+        self.assertIsNone(self.cache.get(self.paths[0]))
+        self.assertNotIn(self.paths[0], self.cache)
+
+    def test_missing_key(self):
+        """Never cache or return images of files which cannot be stat."""
+        self.cache.add(self.paths[0], None, self.pixbuf)
+        self.assertNotIn(self.paths[0], self.cache)
+        self.cache.add(self.paths[0], get_file_key(self.paths[0]),
+                       self.pixbuf)
+        os.remove(self.paths[0])
+        self.assertIsNone(self.cache.get(self.paths[0]))
+        self.assertNotIn(self.paths[0], self.cache)
+
+    def test_original_size(self):
+        """Store the full resolution size of reduced images."""
+        key = get_file_key(self.paths[0])
+        self.cache.add(self.paths[0], key, self.pixbuf, (1920, 1080))
+        self.assertEqual(self.cache.get_original_size(self.paths[0]),
+                         (1920, 1080))
+        self.cache.add(self.paths[1], key, self.pixbuf)
+        self.assertEqual(self.cache.get_original_size(self.paths[1]),
+                         (self.pixbuf.get_width(), self.pixbuf.get_height()))
+        self.assertIsNone(self.cache.get_original_size(self.paths[2]))
+
+    def test_is_current(self):
+        """Validate cached images without using them."""
+        self.assertFalse(self.cache.is_current(self.paths[0]))
+        key = get_file_key(self.paths[0])
+        self.cache.add(self.paths[0], key, self.pixbuf)
+        self.assertTrue(self.cache.is_current(self.paths[0]))
+        self.assertEqual(self.cache.hits + self.cache.misses, 0)
+        os.utime(self.paths[0], ns=(key[0] + 10**9, key[0] + 10**9))
+        self.assertFalse(self.cache.is_current(self.paths[0]))
+
+    def test_evict_least_recently_used(self):
+        """Evict the least recently used image when the budget is exceeded."""
+        settings.override("image_cache_mb", "1")
+        size = PixbufCache.get_pixbuf_size(self.pixbuf)
+        amount = self.cache.get_budget() // size
+        paths = []
+        for i in range(amount + 1):
+            path = os.path.join(self.tmpdir.name, "more_%d.png" % (i))
+            shutil.copyfile(self.paths[0], path)
+            paths.append(path)
+        for path in paths:
+            self.cache.add(path, get_file_key(path), self.pixbuf)
+        self.assertNotIn(paths[0], self.cache)
+        self.assertIn(paths[-1], self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+        settings.override("image_cache_mb", None)
+
+    def test_max_entries(self):
+        """Evict the least recently used image when there are too many."""
+        cache = PixbufCache("thumbnail_cache_mb", "thumbnail_cache_entries",
+                            "Thumbnail cache")
+        settings.override("thumbnail_cache_entries", "2")
+        for path in self.paths:
+            cache.add(path, get_file_key(path), self.pixbuf)
+        self.assertNotIn(self.paths[0], cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIn("2 of 2 entries", cache.get_info())
+        # Trimmed when the setting changes
+        settings.override("thumbnail_cache_entries", "1")
+        self.assertEqual(len(cache), 1)
+        settings.override("thumbnail_cache_entries", None)
+
+    def test_invalidate(self):
+        """Invalidate a cached image."""
+        self.cache.add(self.paths[1], get_file_key(self.paths[1]),
+                       self.pixbuf)
+        self.cache.invalidate(self.paths[1])
+        self.assertNotIn(self.paths[1], self.cache)
+        self.assertFalse(len(self.cache))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
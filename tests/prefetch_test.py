@@ -0,0 +1,77 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test prefetch.py for vimiv's test suite."""
+
+from unittest import main
+
+from vimiv.pixbuf_cache import get_file_key
+from vimiv_testcase import VimivTestCase, refresh_gui
+
+
+class PrefetchTest(VimivTestCase):
+    """Test prefetching of neighbouring images."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.init_test(cls, ["vimiv/testimages/arch_001.jpg"])
+        cls.image = cls.vimiv["image"]
+        cls.prefetcher = cls.image._prefetcher
+        cls.cache = cls.image._cache
+
+    def test_window(self):
+        """Neighbouring images are part of the prefetch window."""
+        paths = self.vimiv.get_paths()
+        index = self.vimiv.get_index()
+        window = self.prefetcher._get_window()
+        self.assertEqual(window[0], paths[(index + 1) % len(paths)])
+        self.assertIn(paths[index - 1], window)
+        self.assertNotIn(paths[index], window)
+        # Disable prefetching
+        self.settings.override("prefetch_amount", "0")
+        self.assertFalse(self.prefetcher._get_window())
+        self.settings.override("prefetch_amount", "1")
+
+    def test_no_wrap_when_shuffled(self):
+        """Do not prefetch across the end of the filelist when shuffling."""
+        self.vimiv["eventhandler"].set_num_str(len(self.vimiv.get_paths()))
+        self.image.move_pos()
+        self.settings.override("shuffle", "true")
+        self.assertNotIn(self.vimiv.get_paths()[0],
+                         self.prefetcher._get_window())
+        self.settings.override("shuffle", "false")
+        self.assertIn(self.vimiv.get_paths()[0], self.prefetcher._get_window())
+
+    def test_prefetched_image(self):
+        """Move to an image which was decoded in the background."""
+        self.prefetcher.update()
+        next_path = self.prefetcher._get_window()[0]
+        count = 0
+        while next_path not in self.cache:
+            if count > 10:
+                self.fail("Image was not prefetched")
+            refresh_gui(0.1)
+            count += 1
+        prefetched = self.cache.get(next_path)
+        self.image.move_index()
+        self.assertEqual(self.vimiv.get_path(), next_path)
+        self.assertEqual(prefetched.get_width(),
+                         self.image.get_pixbuf_original().get_width())
+
+    def test_skip_failed(self):
+        """Do not decode images again which failed to decode."""
+        path = self.prefetcher._get_window()[0]
+        self.cache.invalidate(path)
+        self.prefetcher._skipped[path] = get_file_key(path)
+        self.prefetcher.update()
+        self.assertNotIn(path, self.prefetcher._pending)
+        # Changed files are decoded again
+        self.prefetcher._skipped[path] = (0, 0)
+        self.prefetcher.update()
+        self.assertIn(path, self.prefetcher._pending)
+
+    def tearDown(self):
+        self.vimiv["eventhandler"].set_num_str(1)
+        self.image.move_pos()
+
+
+if __name__ == "__main__":
+    main()
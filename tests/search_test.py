@@ -29,8 +29,10 @@ class SearchTest(TestCase):
         self.assertNotIn("zab", self.search.results)
         self.search.run("z")
         self.assertEqual(["foo_baz", "zab"], self.search.results)
+        self.assertEqual({"foo_baz", "zab"}, self.search.result_set)
         self.search.run("wololo")
         self.assertFalse(self.search.results)
+        self.assertFalse(self.search.result_set)
 
 
 if __name__ == "__main__":
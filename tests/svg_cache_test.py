@@ -0,0 +1,66 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test svg_cache.py for vimiv's test suite."""
+
+import os
+import tempfile
+import time
+from unittest import TestCase, main
+
+from gi import require_version
+require_version("GdkPixbuf", "2.0")
+from vimiv.decode_scheduler import DecodeScheduler
+from vimiv.svg_cache import SvgCache
+
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="100">
+<rect width="100%%" height="100%%" fill="#875FFF"/></svg>"""
+
+
+class SvgCacheTest(TestCase):
+    """Test the cache of rasterised svgs."""
+
+    def setUp(self):
+        self.cache = SvgCache(DecodeScheduler())
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        self.path = os.path.join(self.tmpdir.name, "image.svg")
+        self._write_svg(200)
+
+    def test_get(self):
+        """Rasterise svgs once per height."""
+        pixbuf = self.cache.get(self.path, 50)
+        self.assertEqual(pixbuf.get_height(), 50)
+        self.assertEqual(pixbuf.get_width(), 100)
+        self.assertIs(self.cache.get(self.path, 50), pixbuf)
+        self.assertIsNot(self.cache.get(self.path, 60), pixbuf)
+
+    def test_file_changed(self):
+        """Rasterise again when the file changed."""
+        self.cache.get(self.path, 50)
+        self.cache.get(self.path, 60)
+        self._write_svg(400)
+        pixbuf = self.cache.get(self.path, 50)
+        self.assertEqual(pixbuf.get_width(), 200)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_prerender(self):
+        """Render neighbouring zoom steps in the background."""
+        self.cache.prerender(self.path, [50, 80])
+        for _ in range(50):
+            if (self.path, 50) in self.cache and (self.path, 80) in self.cache:
+                break
+            time.sleep(0.05)
+        else:
+            self.fail("Svg was not rendered in the background")
+
+    def _write_svg(self, width):
+        with open(self.path, "w") as f:
+            f.write(SVG % (width))
+        # Make sure the modification time differs between versions
+        os.utime(self.path, (width, width))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
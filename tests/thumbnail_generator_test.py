@@ -0,0 +1,59 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test thumbnail_generator.py for vimiv's test suite."""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+
+from gi import require_version
+require_version("GdkPixbuf", "2.0")
+from vimiv.thumbnail_generator import generate_thumbnails, get_files
+
+
+class ThumbnailGeneratorTest(TestCase):
+    """Test generating thumbnails without a window."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        self.subdir = os.path.join(self.tmpdir.name, "subdir")
+        os.mkdir(self.subdir)
+        for directory in [self.tmpdir.name, self.subdir]:
+            shutil.copyfile("vimiv/testimages/arch-logo.png",
+                            os.path.join(directory, "arch-logo.png"))
+        with open(os.path.join(self.tmpdir.name, "text.txt"), "w") as f:
+            f.write("Not an image")
+
+    def test_get_files(self):
+        """Find files of directories."""
+        self.assertEqual(len(get_files([self.tmpdir.name])), 2)
+        self.assertEqual(len(get_files([self.tmpdir.name], True)), 3)
+
+    def test_generate(self):
+        """Generate thumbnails once and skip current ones."""
+        counts, images, _ = generate_thumbnails([self.tmpdir.name],
+                                                recursive=True, jobs=2)
+        self.assertEqual(images, 2)
+        self.assertEqual(counts["created"], 4)
+        self.assertEqual(counts["failed"], 0)
+        counts, _, _ = generate_thumbnails([self.tmpdir.name], recursive=True,
+                                           jobs=2)
+        self.assertEqual(counts["created"], 0)
+        self.assertEqual(counts["current"], 4)
+
+    def test_corrupt(self):
+        """Count corrupt images as failed and continue with the others."""
+        with open(os.path.join(self.tmpdir.name, "corrupt.png"), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + b"corrupt" * 100)
+        counts, images, _ = generate_thumbnails([self.tmpdir.name],
+                                                recursive=True, jobs=2)
+        self.assertEqual(images, 3)
+        self.assertEqual(counts["created"], 4)
+        self.assertEqual(counts["failed"], 2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main(buffer=True)
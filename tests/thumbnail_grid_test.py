@@ -0,0 +1,52 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test thumbnail_grid.py for vimiv's test suite."""
+
+from unittest import TestCase, main
+
+from gi import require_version
+require_version("Gtk", "3.0")
+from vimiv.thumbnail_grid import ThumbnailGrid
+
+
+class ThumbnailGridTest(TestCase):
+    """Test the layout of the thumbnail grid."""
+
+    def setUp(self):
+        self.grid = ThumbnailGrid(lambda index: (None, str(index)))
+        self.grid.set_item_size(100)
+        self.grid.set_item_padding(5)
+        self.grid.set_column_spacing(10)
+        self.grid.set_columns(4)
+        self.grid.set_item_count(100000)
+
+    def test_size(self):
+        """Request the size of all items without laying them out."""
+        width, height = self.grid.get_size_request()
+        margin = ThumbnailGrid.MARGIN
+        self.assertEqual(width, 2 * margin + 4 * 110 + 3 * 10)
+        item_height = self.grid._get_item_size()[1]
+        self.assertEqual(height, 2 * margin + 25000 * item_height
+                         + 24999 * ThumbnailGrid.ROW_SPACING)
+
+    def test_position(self):
+        """Calculate rows, columns and the item at a position."""
+        self.assertEqual(self.grid.get_item_row(9), 2)
+        self.assertEqual(self.grid.get_item_column(9), 1)
+        x, y, width, height = self.grid._get_item_area(9)
+        self.assertEqual(self.grid.get_index_at(x + 1, y + 1), 9)
+        self.assertEqual(self.grid.get_index_at(x + width - 1,
+                                                y + height - 1), 9)
+        # Spacing between items
+        self.assertIsNone(self.grid.get_index_at(x + width + 1, y + 1))
+        self.assertIsNone(self.grid.get_index_at(1, 1))
+
+    def test_cursor(self):
+        """Keep the cursor within the items."""
+        self.grid.set_cursor(99999)
+        self.assertEqual(self.grid.get_cursor(), 99999)
+        self.grid.set_item_count(10)
+        self.assertEqual(self.grid.get_cursor(), 9)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test thumbnail_index.py for vimiv's test suite."""
+
+import os
+import tempfile
+from unittest import TestCase, main
+
+from vimiv.thumbnail_index import ThumbnailIndex
+
+
+class ThumbnailIndexTest(TestCase):
+    """Test the persistent index of thumbnails."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        self.path = os.path.join(self.tmpdir.name, "index", "index.sqlite")
+        self.index = ThumbnailIndex(self.path)
+
+    def test_get_directory(self):
+        """Return the thumbnails of a directory."""
+        self.index.add("a.png", 128, "/images/a.jpg", 10, 100)
+        self.index.add("a.png", 256, "/images/a.jpg", 10, 100)
+        self.index.add("b.png", 128, "/images/b.jpg", 20, 200, failed=True)
+        self.index.add("c.png", 128, "/other/c.jpg", 30, 300)
+        self.assertEqual(self.index.get_directory("/images", 128),
+                         {"a.png": (10, 100, False), "b.png": (20, 200, True)})
+        # Entries are replaced
+        self.index.add("a.png", 128, "/images/a.jpg", 11, 101)
+        self.assertEqual(self.index.get_directory("/images", 128)["a.png"],
+                         (11, 101, False))
+
+    def test_persistent(self):
+        """Keep entries when reopening the index."""
+        self.index.add("a.png", 128, "/images/a.jpg", 10, 100)
+        self.index.close()
+        self.index = ThumbnailIndex(self.path)
+        self.assertIn("a.png", self.index.get_directory("/images", 128))
+
+    def test_corrupt(self):
+        """Run without entries if the database cannot be opened."""
+        self.index.close()
+        with open(self.path, "wb") as f:
+            f.write(b"not a database" * 100)
+        self.index = ThumbnailIndex(self.path)
+        self.index.add("a.png", 128, "/images/a.jpg", 10, 100)
+        self.assertEqual(self.index.get_directory("/images", 128), {})
+        self.index.remove([("a.png", 128)])
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,28 @@ test. We therefore test the implementation of the ThumbnailStore directly.
 import hashlib
 import os
 import shutil
+import struct
 import tempfile
-from unittest import TestCase, main
+import zlib
+from threading import Thread
+from time import time
+from unittest import TestCase, main, skipUnless
+from unittest.mock import patch
+from urllib.parse import quote
 
 from gi import require_version
 require_version('Gtk', '3.0')
+require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf
+import vimiv.imageactions as imageactions
+from vimiv.decode_scheduler import DecodeJob
 from vimiv.helpers import get_user_cache_dir
-from vimiv.thumbnail_manager import ThumbnailStore
+from vimiv.thumbnail_manager import (PNG_SIGNATURE, ThumbnailManager,
+                                     ThumbnailStore,
+                                     _create_thumbnail_in_process,
+                                     read_png_text)
+
+from vimiv_testcase import create_jpeg_with_preview, is_blue
 
 
 class ThumbnailManagerTest(TestCase):
@@ -50,6 +65,231 @@ class ThumbnailManagerTest(TestCase):
         # A file that does not exist
         self.assertFalse(self.thumb_store.get_thumbnail("bla"))
 
+    def test_get_existing_thumbnail(self):
+        """Look up existing thumbnails without creating them."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", new_file)
+        self.assertIsNone(self.thumb_store.get_existing_thumbnail(new_file))
+        expected_name = self.thumb_store.get_thumbnail(new_file)
+        self.assertEqual(self.thumb_store.get_existing_thumbnail(new_file),
+                         expected_name)
+        # Outdated thumbnails are ignored
+        os.utime(new_file, (0, 0))
+        self.assertIsNone(self.thumb_store.get_existing_thumbnail(new_file))
+        new_dir.cleanup()
+
+    def test_read_png_text(self):
+        """Read the metadata of thumbnails without decoding them."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", new_file)
+        text = read_png_text(self.thumb_store.get_thumbnail(new_file))
+        self.assertEqual(text[ThumbnailStore.KEY_MTIME],
+                         str(int(os.path.getmtime(new_file))))
+        self.assertEqual(text[ThumbnailStore.KEY_URI], "file://" + new_file)
+        # Not a png
+        self.assertFalse(read_png_text(os.path.abspath(__file__)))
+        new_dir.cleanup()
+
+    def test_read_corrupt_png_text(self):
+        """Read textual chunks of all types and skip corrupt ones."""
+        chunks = [(b"tEXt", b"Text\0value"),
+                  (b"zTXt", b"Compressed\0\0" + zlib.compress(b"value")),
+                  (b"iTXt", b"International\0\0\0en\0\0value"),
+                  (b"iTXt", b"Unicode\0\1\0\0\0"
+                   + zlib.compress("v\u00e4lue".encode())),
+                  (b"iTXt", b"E\0"),
+                  (b"zTXt", b"Corrupt\0\0value"),
+                  (b"tEXt", b"Truncated")]
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.png")
+        with open(new_file, "wb") as f:
+            f.write(PNG_SIGNATURE)
+            for chunk_type, data in chunks + [(b"IEND", b"")]:
+                f.write(struct.pack(">I4s", len(data), chunk_type) + data
+                        + struct.pack(">I", zlib.crc32(chunk_type + data)))
+        self.assertEqual(read_png_text(new_file),
+                         {"Text": "value", "Compressed": "value",
+                          "International": "value", "Unicode": "v\u00e4lue"})
+        new_dir.cleanup()
+
+    def test_create_in_process(self):
+        """Create thumbnails in the process pool."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", new_file)
+        self.assertIsNone(self.thumb_store.get_thumbnail(new_file,
+                                                         create=False))
+        pool = ThumbnailManager._get_process_pool()
+        received_name = pool.apply(_create_thumbnail_in_process,
+                                   (new_file, 256, False, False))
+        self.assertEqual(received_name,
+                         self.thumb_store.get_thumbnail(new_file, create=False))
+        new_dir.cleanup()
+
+    def test_tiers(self):
+        """Create thumbnails in the smallest size fitting the request."""
+        self.assertEqual(ThumbnailStore.get_tier(64), ("normal", 128))
+        self.assertEqual(ThumbnailStore.get_tier(256), ("large", 256))
+        self.assertEqual(ThumbnailStore.get_tier(300), ("x-large", 512))
+        self.assertEqual(ThumbnailStore.get_tier(4096), ("xx-large", 1024))
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", new_file)
+        store = ThumbnailStore(size=512)
+        received_name = store.get_thumbnail(new_file)
+        self.assertEqual(os.path.basename(os.path.dirname(received_name)),
+                         "x-large")
+        self.assertEqual(max(GdkPixbuf.Pixbuf.get_file_info(
+            received_name)[1:]), 512)
+        new_dir.cleanup()
+
+    def test_jpeg(self):
+        """Create thumbnails of JPEGs at the size of the store."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.jpg")
+        shutil.copyfile("vimiv/testimages/arch_001.jpg", new_file)
+        for large in [False, True]:
+            store = ThumbnailStore(large=large)
+            received_name = store.get_thumbnail(new_file)
+            self.assertEqual(max(GdkPixbuf.Pixbuf.get_file_info(
+                received_name)[1:]), store.thumb_size)
+        new_dir.cleanup()
+
+    @skipUnless(imageactions._has_exif, "Needs exif support")
+    def test_exif_preview(self):
+        """Scale the exif preview of JPEGs instead of decoding them."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.jpg")
+        create_jpeg_with_preview(new_file, (300, 150))
+        store = ThumbnailStore(large=True)
+        file_format = GdkPixbuf.Pixbuf.get_file_info(new_file)[0]
+        # The full decode is never used
+        with patch.object(GdkPixbuf.Pixbuf, "new_from_file_at_scale",
+                          side_effect=AssertionError("Decoded the image")):
+            pixbuf = store._load_scaled(new_file, file_format, 800, 400)
+        self.assertEqual(pixbuf.get_width(), store.thumb_size)
+        self.assertTrue(is_blue(pixbuf))
+        # Previews with a different aspect ratio are padded and not used
+        create_jpeg_with_preview(new_file, (300, 300))
+        pixbuf = store._load_scaled(new_file, file_format, 800, 400)
+        self.assertEqual(pixbuf.get_width(), store.thumb_size)
+        self.assertFalse(is_blue(pixbuf))
+        new_dir.cleanup()
+
+    def test_index(self):
+        """Validate thumbnails of a directory with the index."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        new_file = os.path.join(new_dir.name, "test.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", new_file)
+        creator = ThumbnailStore()
+        creator.use_index = True
+        expected_name = creator.get_thumbnail(new_file)
+        store = ThumbnailStore()
+        store.use_index = True
+        self.assertEqual(store._get_indexed_state(new_file), "current")
+        self.assertEqual(store.get_thumbnail(new_file), expected_name)
+        # Sources changed while the entries are reused are not current
+        os.utime(new_file, (0, 0))
+        self.assertIsNone(store._get_indexed_state(new_file))
+        new_dir.cleanup()
+
+    def test_prune_validated(self):
+        """Keep the index entries of a bounded number of directories."""
+        store = ThumbnailStore()
+        store._validated = {str(i): (time() + i, {})
+                            for i in range(store.MAX_DIRECTORIES)}
+        store._validated["expired"] = (0, {})
+        store._prune_validated()
+        self.assertNotIn("expired", store._validated)
+        self.assertNotIn("0", store._validated)
+        self.assertEqual(len(store._validated), store.MAX_DIRECTORIES - 1)
+
+    def test_collect_garbage(self):
+        """Remove outdated thumbnails and trim the store to the budget."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        store = ThumbnailStore()
+        store.base_dir = os.path.join(new_dir.name, "thumbnails")
+        store.fail_dir = os.path.join(store.base_dir, "fail", "vimiv-test")
+        store.use_large_thumbnails()
+        store._ensure_dirs_exist()
+        old_fail_dir = os.path.join(store.base_dir, "fail", "vimiv-0.1")
+        os.makedirs(old_fail_dir)
+        thumbnails = []
+        for name in ["a.png", "b.png", "c.png"]:
+            source = os.path.join(new_dir.name, name)
+            shutil.copyfile("vimiv/testimages/arch-logo.png", source)
+            thumbnails.append(store.get_thumbnail(source))
+        os.remove(os.path.join(new_dir.name, "a.png"))
+        removed, _ = store.collect_garbage(2 ** 40)
+        self.assertEqual(removed, 1)
+        self.assertFalse(os.path.exists(thumbnails[0]))
+        self.assertFalse(os.path.exists(old_fail_dir))
+        self.assertTrue(os.path.exists(thumbnails[1]))
+        # Least recently used thumbnails are removed first
+        os.utime(thumbnails[1], (0, 0))
+        store.collect_garbage(os.path.getsize(thumbnails[2]))
+        self.assertFalse(os.path.exists(thumbnails[1]))
+        self.assertTrue(os.path.exists(thumbnails[2]))
+        new_dir.cleanup()
+
+    def test_collect_garbage_foreign(self):
+        """Keep escaped, unparsable and corrupt thumbnails of other programs."""
+        new_dir = tempfile.TemporaryDirectory(prefix="vimivtests-")
+        store = ThumbnailStore()
+        store.base_dir = os.path.join(new_dir.name, "thumbnails")
+        store.fail_dir = os.path.join(store.base_dir, "fail", "vimiv-test")
+        store.use_large_thumbnails()
+        store._ensure_dirs_exist()
+        source = os.path.join(new_dir.name, "with space.png")
+        shutil.copyfile("vimiv/testimages/arch-logo.png", source)
+        mtime = str(int(os.path.getmtime(source))).encode()
+        uris = {"escaped.png": "file://" + quote(source),
+                "unparsable.png": "file://[invalid/image.png",
+                "missing.png": "file://" + quote(source + ".missing")}
+        for name, uri in uris.items():
+            with open(os.path.join(store.thumbnail_dir, name), "wb") as f:
+                f.write(PNG_SIGNATURE)
+                for data in [b"Thumb::URI\0" + uri.encode(),
+                             b"Thumb::MTime\0" + mtime]:
+                    f.write(struct.pack(">I4s", len(data), b"tEXt") + data
+                            + struct.pack(">I", zlib.crc32(b"tEXt" + data)))
+        with open(os.path.join(store.thumbnail_dir, "corrupt.png"), "wb") as f:
+            f.write(PNG_SIGNATURE + b"\0\0\0")
+        removed, _ = store.collect_garbage(2 ** 40)
+        self.assertEqual(removed, 1)
+        self.assertEqual(sorted(os.listdir(store.thumbnail_dir)),
+                         ["corrupt.png", "escaped.png", "unparsable.png"])
+        new_dir.cleanup()
+
+    def test_get_store(self):
+        """Create a single store per size for all worker threads."""
+        manager = ThumbnailManager()
+        stores = []
+        threads = [Thread(target=lambda: stores.append(manager._get_store(512)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, stores))), 1)
+        self.assertEqual(stores[0].thumb_size, 512)
+
+    def test_batch(self):
+        """Pass loaded thumbnails to their callbacks in one batch."""
+        manager = ThumbnailManager()
+        loaded = []
+        for index in range(3):
+            job = DecodeJob(0, manager._do_get_thumbnail_job,
+                            ("vimiv/testimages/arch-logo.png", 128,
+                             lambda pixbuf, i: loaded.append(i), index,
+                             False, False))
+            job.run()
+        self.assertFalse(loaded)
+        manager._deliver_results()
+        self.assertEqual(loaded, [0, 1, 2])
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,121 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test thumbnail_scheduler.py for vimiv's test suite."""
+
+from unittest import TestCase, main
+
+from vimiv.decode_scheduler import DecodeJob
+from vimiv.thumbnail_scheduler import ThumbnailScheduler
+
+
+class RecordingManager(object):
+    """ThumbnailManager replacement remembering the requested thumbnails."""
+
+    def __init__(self):
+        """Start without requested thumbnails."""
+        self.jobs = []
+
+    def get_thumbnail_at_scale_async(self, filename, size, callback, index,
+                                     ignore_cache=False, skip_current=False):
+        job = DecodeJob(0, callback, (index,))
+        self.jobs.append((filename, job))
+        return job
+
+    def get_queued(self):
+        return [filename for filename, job in self.jobs if not job.cancelled]
+
+    def finish(self, filename):
+        for name, job in self.jobs:
+            if name == filename and not job.cancelled:
+                job.cancel()
+                job._function("pixbuf", *job._args)
+
+
+class ThumbnailSchedulerTest(TestCase):
+    """Test the order in which thumbnails are loaded."""
+
+    def setUp(self):
+        self.manager = RecordingManager()
+        self.loaded = []
+        self.scheduler = ThumbnailScheduler(self.manager, self._on_loaded)
+        self.scheduler.QUEUE_LENGTH = 6
+        self.paths = [str(i) for i in range(20)]
+
+    def _on_loaded(self, pixbuf, index):
+        self.loaded.append(index)
+
+    def test_visible_first(self):
+        """Load visible thumbnails, then in scroll direction, then others."""
+        self.scheduler.load_all(self.paths, 128, visible=(10, 11))
+        self.assertEqual(self.manager.get_queued(),
+                         ["10", "11", "12", "13", "9", "8"])
+
+    def test_scroll(self):
+        """Cancel queued thumbnails and reorder them when scrolling."""
+        self.scheduler.load_all(self.paths, 128, visible=(10, 11))
+        self.manager.finish("10")
+        self.assertEqual(self.loaded, [10])
+        self.scheduler.update_visible(4, 5)
+        self.assertEqual(self.manager.get_queued(),
+                         ["4", "5", "3", "2", "6", "7"])
+        self.assertEqual(len(self.scheduler), 19)
+
+    def test_scroll_running(self):
+        """Keep thumbnails which are already decoding when scrolling."""
+        self.scheduler.load_all(self.paths, 128, visible=(10, 11))
+        running = self.manager.jobs[0][1]
+        running.started = True
+        self.scheduler.update_visible(4, 5)
+        self.assertFalse(running.cancelled)
+        self.assertEqual(self.manager.get_queued(),
+                         ["10", "4", "5", "3", "2", "6"])
+        self.manager.finish("10")
+        self.assertEqual(self.loaded, [10])
+
+    def test_preload(self):
+        """Only load thumbnails close to the visible region."""
+        self.scheduler.QUEUE_LENGTH = 20
+        self.scheduler.load_all(self.paths, 128, visible=(10, 11))
+        self.assertEqual(self.scheduler.get_range(), (6, 15))
+        self.assertEqual(sorted(self.manager.get_queued(), key=int),
+                         [str(i) for i in range(6, 16)])
+        # Unloaded thumbnails are loaded again when scrolling back
+        for i in range(6, 16):
+            self.manager.finish(str(i))
+        self.scheduler.update_visible(0, 1)
+        self.scheduler.unload(range(10, 16))
+        self.scheduler.update_visible(10, 11)
+        self.assertEqual(sorted(self.manager.get_queued(), key=int),
+                         [str(i) for i in range(10, 16)])
+        self.assertEqual(len(self.scheduler), 16)
+
+    def test_update_paths(self):
+        """Only load inserted thumbnails when the paths change."""
+        self.scheduler.load_all(self.paths, 128, visible=(0, 1))
+        self.manager.finish("0")
+        self.manager.finish("1")
+        stale = [job for name, job in self.manager.jobs
+                 if name == "2" and not job.cancelled][0]
+        paths = ["new"] + self.paths[1:]
+        self.scheduler.update_paths(paths, [0])
+        self.assertEqual(self.manager.get_queued(),
+                         ["new", "2", "3", "4", "5"])
+        self.assertEqual(len(self.scheduler), 19)
+        # Results of queued thumbnails at their old index are dropped
+        stale._function("pixbuf", *stale._args)
+        self.assertEqual(self.loaded, [0, 1])
+
+    def test_cancel(self):
+        """Drop results of thumbnails which were cancelled."""
+        self.scheduler.load_all(self.paths, 128, visible=(0, 1))
+        self.scheduler.cancel()
+        self.assertFalse(self.manager.get_queued())
+        self.assertFalse(len(self.scheduler))
+        # Results of an earlier load are ignored after reloading
+        stale = self.manager.jobs[0][1]
+        self.scheduler.load_all(self.paths, 256, visible=(0, 1))
+        stale._function("pixbuf", *stale._args)
+        self.assertFalse(self.loaded)
+
+
+if __name__ == "__main__":
+    main()
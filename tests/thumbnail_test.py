@@ -5,7 +5,6 @@ import os
 from unittest import main
 
 from gi import require_version
-from gi.repository import Gtk
 
 from vimiv_testcase import VimivTestCase, refresh_gui
 
@@ -31,10 +30,9 @@ class ThumbnailTest(VimivTestCase):
         self.assertFalse(self.thumb.toggled)
         self.assertFalse(self.thumb.is_focus())
 
-    def test_iconview_clicked(self):
+    def test_item_activated(self):
         """Select thumbnail."""
-        path = Gtk.TreePath([1])
-        self.thumb.emit("item-activated", path)
+        self.thumb.emit("item-activated", 1)
         self.assertFalse(self.thumb.toggled)
         self.assertFalse(self.thumb.is_focus())
         expected_image = os.path.abspath("arch_001.jpg")
@@ -86,7 +84,7 @@ class ThumbnailTest(VimivTestCase):
                          self.vimiv.get_pos(True))
         # Get amount of rows for vertical scrolling
         last = len(self.vimiv.get_paths()) - 1
-        rows = self.thumb.get_item_row(Gtk.TreePath(last)) + 1
+        rows = self.thumb.get_item_row(last) + 1
         if rows > 1:
             self.fail("Implementation not done for more than one row.")
         for direction in "jkJK":
@@ -149,14 +147,23 @@ class ThumbnailTest(VimivTestCase):
         self.vimiv["window"].zoom(False)
         self.assertEqual(self.thumb.get_zoom_level(), (128, 128))
 
+    def test_paths_changed(self):
+        """Update the rows of changed paths."""
+        paths = list(self.vimiv.get_paths())
+        for new_paths in [paths[1:], list(reversed(paths)), paths]:
+            self.vimiv.populate(new_paths, expand_single=False)
+            self.thumb.on_paths_changed()
+            self.assertEqual(self.thumb.get_item_count(), len(new_paths))
+            for index, path in enumerate(new_paths):
+                name = self.thumb.get_item(index)[1]
+                expected_name = os.path.splitext(os.path.basename(path))[0]
+                self.assertTrue(name.startswith(expected_name))
+
     def _get_thumbnail_name(self):
-        model = self.thumb.get_model()
-        index = self.thumb.get_position()
-        return model.get_value(model.get_iter(index), 1)
+        return self.thumb.get_item(self.thumb.get_position())[1]
 
     def _get_thumbnail_pixbuf(self, index):
-        model = self.thumb.get_model()
-        return model.get_value(model.get_iter(index), 0)
+        return self.thumb.get_item(index)[0]
 
     def _get_pixbuf_scale(self):
         pixbuf = self._get_thumbnail_pixbuf(0)
@@ -0,0 +1,78 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Test tiles.py for vimiv's test suite."""
+
+from unittest import TestCase, main
+
+from gi import require_version
+require_version("Gdk", "3.0")
+require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf
+from vimiv.tiles import TilePyramid
+
+
+class TilePyramidTest(TestCase):
+    """Test the multi-resolution tile pyramid."""
+
+    def setUp(self):
+        pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8,
+                                      1000, 600)
+        pixbuf.fill(0x875FFFFF)
+        self.pyramid = TilePyramid(pixbuf)
+        self.size = TilePyramid.TILE_SIZE
+
+    def test_visible_tiles(self):
+        """Only render tiles intersecting the requested region."""
+        tiles = self.pyramid.get_tiles(1, 0, 0, self.size, self.size)
+        # The region touches the neighbouring tiles at its border
+        self.assertEqual(len(tiles), 4)
+        x, y, tile = tiles[0]
+        self.assertEqual((x, y), (0, 0))
+        self.assertEqual(tile.get_width(), self.size)
+        # Tiles at the border of the image are smaller
+        tiles = self.pyramid.get_tiles(1, 999, 599, 1, 1)
+        _, _, tile = tiles[0]
+        self.assertEqual(tile.get_width(), 1000 % self.size)
+        self.assertEqual(tile.get_height(), 600 % self.size)
+
+    def test_zoom(self):
+        """Render tiles at different zoom levels."""
+        tiles = self.pyramid.get_tiles(4, 0, 0, 4000, 2400)
+        self.assertEqual(len(tiles), 16 * 10)
+        tiles = self.pyramid.get_tiles(0.1, 0, 0, 100, 60)
+        self.assertEqual(len(tiles), 1)
+        _, _, tile = tiles[0]
+        self.assertEqual(tile.get_width(), 100)
+        # Smaller levels of the pyramid were created lazily
+        self.assertGreater(len(self.pyramid._levels), 1)
+
+    def test_fast_tiles(self):
+        """Render tiles again in high quality after rendering them fast."""
+        _, _, fast_tile = self.pyramid.get_tiles(2, 0, 0, 1, 1, fast=True)[0]
+        # Tiles of high quality are reused when drawing fast
+        _, _, tile = self.pyramid.get_tiles(2, 0, 0, 1, 1)[0]
+        self.assertIsNot(tile, fast_tile)
+        self.assertIs(self.pyramid.get_tiles(2, 0, 0, 1, 1, fast=True)[0][2],
+                      tile)
+
+    def test_surface(self):
+        """Paint images which are not tiled from the surface of a level."""
+        surface, scale = self.pyramid.get_surface(0.3)
+        self.assertEqual(scale, 0.5)
+        self.assertEqual(surface.get_width(), 500)
+        # The surface is reused
+        self.assertIs(self.pyramid.get_surface(0.4)[0], surface)
+        self.assertIsNot(self.pyramid.get_surface(1)[0], surface)
+
+    def test_evict(self):
+        """Evict tiles which left the visible region."""
+        self.pyramid.get_tiles(1, 0, 0, 1000, 600)
+        self.assertEqual(len(self.pyramid), 12)
+        self.pyramid.evict(1, 0, 0, self.size - 1, self.size - 1)
+        self.assertEqual(len(self.pyramid), 1)
+        # Tiles of a different zoom level are never visible
+        self.pyramid.evict(2, 0, 0, 1000, 600)
+        self.assertFalse(len(self.pyramid))
+
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,34 @@ def compare_files(file1, file2):
     return compare_pixbufs(pb1, pb2)
 
 
+def create_jpeg_with_preview(filename, preview_size):
+    """Save a red 800x400 JPEG with a blue exif preview of preview_size.
+
+    Args:
+        filename: Name of the JPEG to create.
+        preview_size: Tuple of width and height of the preview.
+    """
+    from gi.repository import GExiv2
+    image = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, 800, 400)
+    image.fill(0xFF0000FF)
+    image.savev(filename, "jpeg", [], [])
+    preview = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8,
+                                   *preview_size)
+    preview.fill(0x0000FFFF)
+    preview_file = filename + ".preview.jpg"
+    preview.savev(preview_file, "jpeg", [], [])
+    exif = GExiv2.Metadata(filename)
+    exif.set_exif_thumbnail_from_file(preview_file)
+    exif.save_file()
+    os.remove(preview_file)
+
+
+def is_blue(pixbuf):
+    """Return True if the first pixel of pixbuf is mostly blue."""
+    red, _, blue = pixbuf.get_pixels()[:3]
+    return blue > 200 and red < 50
+
+
 class VimivTestCase(TestCase):
     """Wrapper Class of TestCase."""
 
@@ -12,6 +12,7 @@ from vimiv.completions import Completion
 from vimiv.config_parser import parse_config
 from vimiv.eventhandler import EventHandler
 from vimiv.fileactions import ClipboardHandler, populate
+from vimiv.helpers import sizeof_fmt
 from vimiv.information import Information
 from vimiv.library import Library
 from vimiv.log import Log
@@ -22,6 +23,8 @@ from vimiv.settings import settings
 from vimiv.slideshow import Slideshow
 from vimiv.statusbar import Statusbar
 from vimiv.tags import TagHandler
+from vimiv.thumbnail_generator import generate_thumbnails
+from vimiv.thumbnail_manager import ThumbnailStore
 from vimiv.transform import Transform
 from vimiv.window import Window
 
@@ -32,6 +35,8 @@ class Vimiv(Gtk.Application):
     Attributes:
         debug: If True, write all messages and commands to log.
 
+        _commandline_paths: List of paths given on the commandline which are
+            opened once vimiv is activated.
         _tmpdir: tmpfile.TemporaryDirectory used when running with
             --temp-basedir
         _widgets: Dictionary of vimiv widgets.
@@ -59,7 +64,8 @@ class Vimiv(Gtk.Application):
         app_id = "org.vimiv" + str(time()).replace(".", "")
         super(Vimiv, self).__init__(application_id=app_id)
         self.set_flags(Gio.ApplicationFlags.HANDLES_OPEN)
-        self.connect("activate", self.activate_vimiv)
+        self.connect("activate", self._on_activate)
+        self._commandline_paths = []
         self._paths = []
         self._index = 0
         self._widgets = {}
@@ -93,6 +99,24 @@ class Vimiv(Gtk.Application):
         # Activate vimiv after opening files
         self.activate_vimiv(self)
 
+    def _on_activate(self, app):
+        """Open the paths given on the commandline or activate vimiv.
+
+        The paths are collected as remaining commandline arguments so that
+        --generate-thumbnails receives them. They are therefore opened here
+        instead of by Gio.Application.
+
+        Args:
+            app: The application itself.
+        """
+        if self._commandline_paths:
+            files = [Gio.File.new_for_commandline_arg(path)
+                     for path in self._commandline_paths]
+            self._commandline_paths = []
+            self.open(files, "")
+        else:
+            self.activate_vimiv(app)
+
     def do_handle_local_options(self, options):
         """Handle commandline arguments.
 
@@ -172,8 +196,50 @@ class Vimiv(Gtk.Application):
         set_option("slideshow-delay", "slideshow_delay", 2)
         set_option("geometry", "geometry", 2)
 
+        if options.contains(GLib.OPTION_REMAINING):
+            self._commandline_paths = [
+                os.fsdecode(path.rstrip(b"\0")) for path in
+                options.lookup_value(GLib.OPTION_REMAINING).unpack()]
+
+        # Clean up and fill the thumbnail store without opening a window
+        if options.contains("thumbnail-gc"):
+            budget = settings["thumbnail_gc_mb"].get_value() * 1024 * 1024
+            removed, freed = ThumbnailStore().collect_garbage(budget)
+            print("Removed %d thumbnails, freed %s"
+                  % (removed, sizeof_fmt(freed)))
+            if not options.contains("generate-thumbnails"):
+                return 0
+        if options.contains("generate-thumbnails"):
+            return self._generate_thumbnails(options)
+
         return -1  # To continue
 
+    def _generate_thumbnails(self, options):
+        """Generate thumbnails for the --generate-thumbnails option.
+
+        Args:
+            options: The dictionary containing all options given to the
+                commandline.
+        Return:
+            Exit-code.
+        """
+        jobs = None
+        if options.contains("jobs"):
+            jobs = options.lookup_value("jobs").unpack()
+            if jobs < 1:
+                print("The number of jobs must be positive")
+                return 2
+        # Files are not opened but thumbnailed
+        paths = self._commandline_paths or [os.getcwd()]
+        self._commandline_paths = []
+        counts, images, elapsed = generate_thumbnails(
+            paths, recursive=settings["recursive"].get_value(), jobs=jobs)
+        print("Processed %d images in %.1fs (%.1f images/s)"
+              % (images, elapsed, images / elapsed))
+        print(", ".join("%d %s" % (count, result)
+                        for result, count in counts.items()))
+        return 1 if counts["failed"] else 0
+
     def activate_vimiv(self, app):
         """Starting point for the vimiv application.
 
@@ -352,6 +418,16 @@ class Vimiv(Gtk.Application):
         add_option("config", 0, "Use FILE as local configuration file",
                    arg=GLib.OptionArg.STRING, value="FILE")
         add_option("debug", 0, "Run in debug mode")
+        add_option("generate-thumbnails", 0,
+                   "Generate thumbnails of the given paths and exit")
+        add_option("jobs", 0, "Generate thumbnails in N processes",
+                   arg=GLib.OptionArg.INT, value="N")
+        add_option("thumbnail-gc", 0,
+                   "Clean up the thumbnail cache and exit")
+        # Collect the paths to open, they are not passed to
+        # handle-local-options otherwise
+        add_option(GLib.OPTION_REMAINING, 0, "Images and directories to open",
+                   arg=GLib.OptionArg.FILENAME_ARRAY, value="[PATH...]")
 
     def _init_widgets(self):
         """Create all the other widgets and add them to the class."""
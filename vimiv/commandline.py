@@ -435,6 +435,7 @@ class Search(GObject.Object):
 
     Attributes:
         results: List of files in search results.
+        result_set: Set of the files in search results for fast lookups.
 
         _filelist: List of files to operate search on.
         _last_file: Filename that was focused before search.
@@ -458,6 +459,7 @@ class Search(GObject.Object):
         self._filelist = []
         self._last_file = ""
         self.results = []
+        self.result_set = set()
         self._last_widget = ""
 
         if settings["incsearch"].get_value():
@@ -490,6 +492,7 @@ class Search(GObject.Object):
             [fil for fil in self._filelist
              if searchstr in fil
              or not case_sensitive and searchstr.lower() in fil.lower()]
+        self.result_set = set(self.results)
         if self.results:
             self.next_result(forward=True)
         else:
@@ -518,7 +521,7 @@ class Search(GObject.Object):
         filelist = filelist[index:] + filelist[:index]
         # Find next match
         for i, f in enumerate(filelist):
-            if f in self.results:
+            if f in self.result_set:
                 count += 1
                 if repeat == count:
                     new_pos = (index + i) if forward \
@@ -533,6 +536,7 @@ class Search(GObject.Object):
         last_pos = self._filelist.index(self._last_file) \
             if self._last_file in self._filelist else None
         self.results = []
+        self.result_set = set()
         self.emit("search-completed", last_pos, self._last_widget)
 
 
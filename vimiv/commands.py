@@ -75,6 +75,8 @@ class Commands(object):
                          positional_args=["formatstring"],
                          last_arg_allows_space=True)
         self.add_command("fullscreen", self._app["window"].toggle_fullscreen)
+        self.add_command("image_cache_info",
+                         self._app["image"].show_cache_info)
         self.add_command("last", self._app["image"].move_pos,
                          default_args=[True], supports_count=True)
         self.add_command("last_lib", self._app["library"].move_pos,
@@ -123,6 +125,10 @@ class Commands(object):
                          positional_args=["tagname"],
                          last_arg_allows_space=True)
         self.add_command("thumbnail", self._app["thumbnail"].toggle)
+        self.add_command("thumbnail_cache_info",
+                         self._app["thumbnail"].show_cache_info)
+        self.add_command("thumbnail_gc",
+                         self._app["thumbnail"].collect_garbage)
         self.add_command("version", self._app["information"].show_version_info)
         self.add_command("w", self._app["transform"].write)
         self.add_command("wq", self._app["transform"].write,
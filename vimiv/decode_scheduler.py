@@ -0,0 +1,114 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Scheduler running image decodes in a bounded pool of worker threads."""
+
+import itertools
+import os
+import queue
+import sys
+from threading import Lock, Thread
+
+
+class DecodeJob(object):
+    """A decode submitted to the DecodeScheduler.
+
+    Attributes:
+        cancelled: If True the job was superseded. It is skipped if it did not
+            start yet, running jobs should check this regularly and stop.
+        priority: Priority of the job, lower values run first.
+        started: If True a worker started running the job.
+
+        _args: Arguments passed to _function after the job.
+        _function: Function doing the actual decode.
+    """
+
+    def __init__(self, priority, function, args):
+        """Initialize attributes.
+
+        Args:
+            priority: Priority of the job, lower values run first.
+            function: Function doing the actual decode.
+            args: Arguments passed to function after the job.
+        """
+        self.cancelled = False
+        self.priority = priority
+        self.started = False
+        self._function = function
+        self._args = args
+
+    def cancel(self):
+        """Skip the job if it did not start yet, otherwise ask it to stop."""
+        self.cancelled = True
+
+    def run(self):
+        """Run the decode unless the job was cancelled."""
+        if not self.cancelled:
+            self.started = True
+            self._function(self, *self._args)
+
+
+class DecodeScheduler(object):
+    """Run decode jobs by priority in a bounded pool of worker threads.
+
+    Jobs are functions called with the DecodeJob as first argument. They run in
+    a worker thread and must hand their results to the main loop via
+    GLib.idle_add.
+
+    Attributes:
+        _counter: Counter keeping jobs of equal priority in submission order.
+        _lock: Lock guarding the list of workers.
+        _queue: PriorityQueue of waiting jobs.
+        _workers: List of started worker threads.
+    """
+
+    # Priorities of jobs
+    CURRENT = 0
+    PREFETCH = 1
+    # Maximum number of decodes running at the same time
+    MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+    def __init__(self, max_workers=None):
+        """Initialize attributes.
+
+        Args:
+            max_workers: Maximum number of decodes running at the same time.
+                Defaults to MAX_WORKERS.
+        """
+        if max_workers is not None:
+            self.MAX_WORKERS = max_workers
+        self._counter = itertools.count()
+        self._lock = Lock()
+        self._queue = queue.PriorityQueue()
+        self._workers = []
+
+    def submit(self, function, *args, priority=PREFETCH):
+        """Add a decode job to the queue.
+
+        Args:
+            function: Function to run, called with the job and args.
+            args: Further arguments passed to function.
+            priority: Priority of the job, CURRENT runs before PREFETCH.
+        Return:
+            The DecodeJob which can be used to cancel the decode.
+        """
+        job = DecodeJob(priority, function, args)
+        self._queue.put((priority, next(self._counter), job))
+        with self._lock:
+            # Workers are started lazily until the pool is full
+            if len(self._workers) < self.MAX_WORKERS:
+                worker = Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        return job
+
+    def __len__(self):
+        """Return the number of jobs waiting to be run."""
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            # An error in one job must not stop the worker
+            try:
+                job.run()
+            except Exception:  # pylint: disable=broad-except
+                sys.excepthook(*sys.exc_info())
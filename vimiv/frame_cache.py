@@ -0,0 +1,131 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Cache of pre-scaled frames of the playing animation."""
+
+import os
+
+from gi.repository import Gdk, GdkPixbuf
+from vimiv.settings import settings
+
+
+def count_gif_frames(filename):
+    """Count the frames of a gif without decoding them.
+
+    Only the block structure of the file is read, image data is skipped.
+
+    Args:
+        filename: Name of the gif to read.
+    Return:
+        Number of frames, None if the file is no complete gif.
+    """
+    try:
+        with open(filename, "rb") as f:
+            header = f.read(13)
+            if len(header) < 13 or header[:3] != b"GIF":
+                return None
+            _skip_color_table(f, header[10])
+            frames = 0
+            while True:
+                block = f.read(1)
+                if block == b"!":  # Extension
+                    f.seek(1, os.SEEK_CUR)  # Label
+                    _skip_sub_blocks(f)
+                elif block == b",":  # Image descriptor
+                    descriptor = f.read(9)
+                    if len(descriptor) < 9:
+                        return None
+                    _skip_color_table(f, descriptor[8])
+                    f.seek(1, os.SEEK_CUR)  # Minimum LZW code size
+                    _skip_sub_blocks(f)
+                    frames += 1
+                elif block == b";":  # Trailer
+                    return frames
+                else:  # Truncated or corrupt
+                    return None
+    except OSError:
+        return None
+
+
+def _skip_color_table(f, flags):
+    if flags & 0x80:
+        f.seek(3 << ((flags & 0x07) + 1), os.SEEK_CUR)
+
+
+def _skip_sub_blocks(f):
+    size = f.read(1)
+    while size and size != b"\0":
+        f.seek(size[0], os.SEEK_CUR)
+        size = f.read(1)
+
+
+class FrameCache(object):
+    """Store the frames of an animation scaled to the displayed size.
+
+    The first loop of an animation scales every frame once, later loops are
+    played from the cache. Frames are identified by their index within the
+    loop which is tracked by the image as the animation advances. Frames with
+    an unknown index are scaled every time. The cache is cleared when the
+    displayed size changes. Frames are cached in the order they are played
+    until the budget defined by the animation_cache_mb setting is used. Frames
+    exceeding it are scaled every time as evicting older frames would only
+    thrash when looping.
+
+    Attributes:
+        _frame: GdkPixbuf.Pixbuf of the current frame at full size.
+        _frames: Dictionary of cached frames.
+            Key: Index of the frame; Item: cairo.ImageSurface.
+        _index: Index of the current frame within the loop, None if unknown.
+        _memory: Memory occupied by all cached frames in bytes.
+        _size: Tuple of width and height the frames are scaled to.
+    """
+
+    def __init__(self):
+        """Start with an empty cache."""
+        self._frame = None
+        self._frames = {}
+        self._index = None
+        self._memory = 0
+        self._size = (0, 0)
+
+    def set_frame(self, frame, index):
+        """Set the frame the animation advanced to.
+
+        Args:
+            frame: GdkPixbuf.Pixbuf of the frame at full size.
+            index: Index of the frame within the loop, None if unknown.
+        """
+        self._frame = frame
+        self._index = index
+
+    def get(self, width, height):
+        """Return the current frame scaled to width and height.
+
+        Args:
+            width: Width to scale the frame to.
+            height: Height to scale the frame to.
+        Return:
+            cairo.ImageSurface of the scaled frame.
+        """
+        if (width, height) != self._size:
+            self.clear()
+            self._size = (width, height)
+        if self._index in self._frames:
+            return self._frames[self._index]
+        scaled = self._frame.scale_simple(width, height,
+                                          GdkPixbuf.InterpType.BILINEAR)
+        surface = Gdk.cairo_surface_create_from_pixbuf(scaled, 1, None)
+        memory = surface.get_stride() * surface.get_height()
+        if self._index is not None \
+                and self._memory + memory <= self.get_budget():
+            self._frames[self._index] = surface
+            self._memory += memory
+        return surface
+
+    def clear(self):
+        self._frames.clear()
+        self._memory = 0
+
+    def get_budget(self):
+        return settings["animation_cache_mb"].get_value() * 1024 * 1024
+
+    def __len__(self):
+        return len(self._frames)
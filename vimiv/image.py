@@ -1,20 +1,33 @@
 # vim: ft=python fileencoding=utf-8 sw=4 et sts=4
 """Image part of vimiv."""
 
+import mmap
+import os
 from random import shuffle
-from threading import Thread
+from time import time
 
-from gi.repository import GdkPixbuf, GLib, Gtk
+import cairo
+from gi.repository import Gdk, GdkPixbuf, GLib, Gtk
+from vimiv.decode_scheduler import DecodeScheduler
 from vimiv.exceptions import StringConversionError
 from vimiv.fileactions import is_animation, is_svg
+from vimiv.frame_cache import FrameCache, count_gif_frames
 from vimiv.helpers import get_float
+from vimiv.imageactions import get_exif_preview
+from vimiv.pixbuf_cache import PixbufCache, get_file_key
+from vimiv.prefetch import Prefetcher
 from vimiv.settings import settings
+from vimiv.svg_cache import SvgCache
+from vimiv.thumbnail_manager import ThumbnailStore
+from vimiv.tiles import TilePyramid
 
 
-class Image(Gtk.Image):
+class Image(Gtk.DrawingArea):
     """Image class for vimiv.
 
-    Inherits from Gtk.Image and includes all actions that apply to it.
+    Inherits from Gtk.DrawingArea and includes all actions that apply to it.
+    Zoom, rotation and flips are applied as cairo transformation when drawing
+    so no transformed copies of the image are allocated.
 
     Attributes:
         fit_image:
@@ -26,14 +39,54 @@ class Image(Gtk.Image):
         zoom_percent: Percentage to zoom to compared to the original size.
 
         _app: The main vimiv class to interact with.
+        _cache: PixbufCache of decoded images.
+        _full_resolution_pending: If True the image is currently being decoded
+            at full resolution.
         _identifier: Used so GUI callbacks are only done if the image is equal
+        _jobs: List of DecodeJobs of the current image.
+        _original_size: Full resolution size of the image as a tuple, not
+            taking rotations into account.
         _pixbuf_iter: Iter of displayed animation.
-        _pixbuf_original: Original image.
+        _animation_time: Time in ms the animation was played for. The iter is
+            advanced by exactly one frame at a time with it.
+        _frame_count: Number of frames of the animation, None if unknown.
+        _frame_index: Number of frames the animation advanced.
+        _pixbuf_original: Original image. Large images are decoded at the
+            resolution needed to fit them into the window first.
+        _placeholder: If True a thumbnail is shown while the image is still
+            being decoded.
+        _prefetcher: Prefetcher decoding the surrounding images.
+        _scheduler: DecodeScheduler running all decodes of images.
+        _pyramid: TilePyramid of the displayed image used for drawing. None if
+            no image was displayed yet.
+        _pyramid_partial: If True _pyramid was created from a partially decoded
+            image or from a frame of a playing animation.
         _size: Size of the displayed image as a tuple.
+        _svg_cache: SvgCache of rasterised svgs.
+        _thumbnail_store: ThumbnailStore to look up placeholders.
+        _tiled: If True the image is zoomed very large and drawn in tiles.
         _timer_id: Id of current animation timer.
+        _transformations: List of rotations and flips applied since loading.
         _faulty_image: Necessary evil for images that PixbufLoader cannot read.
+        _frames: FrameCache of the playing animation.
+        _fast: If True the image is drawn in fast quality as there is ongoing
+            user interaction.
+        _quality_id: Id of the timer redrawing the image in high quality.
     """
 
+    # Files are streamed into the PixbufLoader in chunks of this many bytes
+    CHUNK_SIZE = 256 * 1024
+    # Files larger than this are mapped into memory instead of being read
+    MMAP_THRESHOLD = 32 * 1024 * 1024
+    # Minimum time in seconds between repaints of partially decoded images
+    REPAINT_INTERVAL = 0.1
+    # Zoomed images with more pixels than this are rendered in tiles
+    TILE_THRESHOLD = 4096 * 4096
+    # Files at least this large show a thumbnail while they are decoded
+    PLACEHOLDER_THRESHOLD = 1024 * 1024
+    # Zooming in multiplies the zoom level by 1 + ZOOM_DELTA per step
+    ZOOM_DELTA = 0.25
+
     def __init__(self, app):
         """Set default values for attributes."""
         super(Image, self).__init__()
@@ -42,46 +95,196 @@ class Image(Gtk.Image):
         # Settings and defaults
         self.fit_image = "overzoom"
         self._pixbuf_iter = GdkPixbuf.PixbufAnimationIter()
+        self._animation_time = 0
+        self._frame_count = None
+        self._frame_index = 0
         self._pixbuf_original = GdkPixbuf.Pixbuf()
         self.zoom_percent = 1
         self._identifier = 0
+        self._original_size = (1, 1)
+        self._full_resolution_pending = False
         self._size = (1, 1)
         self._timer_id = 0
+        self._transformations = []
         self._faulty_image = False
+        self._fast = False
+        self._quality_id = 0
+        self._pyramid = None
+        self._pyramid_partial = False
+        self._frames = FrameCache()
+        self._tiled = False
+        self._cache = PixbufCache()
+        self._jobs = []
+        self._scheduler = DecodeScheduler()
+        self._prefetcher = Prefetcher(app, self._cache, self._scheduler)
+        self._svg_cache = SvgCache(self._scheduler)
+        self._thumbnail_store = ThumbnailStore()
+        self._placeholder = False
 
         # Connect signals
         self._app["transform"].connect("changed", self._on_image_changed)
+        self._app["transform"].connect("applied-to-file",
+                                       self._on_applied_to_file)
         self._app["commandline"].search.connect("search-completed",
                                                 self._on_search_completed)
         settings.connect("changed", self._on_settings_changed)
 
-    def _update(self):
-        """Show the final image."""
-        if not self._app.get_paths() or self._faulty_image:
+    def _update(self, partial=False):
+        """Show the final image.
+
+        Args:
+            partial: If True, show an image which is still being decoded.
+        """
+        if not self._app.get_paths() or self._faulty_image and not partial:
             return
-        # Scale image
-        pbo_width = self._pixbuf_original.get_width()
-        pbo_height = self._pixbuf_original.get_height()
-        pbf_width = int(pbo_width * self.zoom_percent)
-        pbf_height = int(pbo_height * self.zoom_percent)
-        # Rescaling of svg
+        width, height = self.get_displayed_size()
+        pbf_width, pbf_height = self._get_unrotated_size(width, height)
+        # Rescaling of svg, the neighbouring zoom steps are rendered ahead
         if is_svg(self._app.get_path()) and settings["rescale_svg"].get_value():
-            pixbuf_final = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                self._app.get_path(), -1, pbf_height, True)
+            pixbuf = self._svg_cache.get(self._app.get_path(), pbf_height)
+            self._svg_cache.prerender(
+                self._app.get_path(),
+                [int(pbf_height * (1 + self.ZOOM_DELTA)),
+                 int(pbf_height / (1 + self.ZOOM_DELTA))])
         else:
-            pixbuf_final = self._pixbuf_original.scale_simple(
-                pbf_width, pbf_height, GdkPixbuf.InterpType.BILINEAR)
-        self.set_from_pixbuf(pixbuf_final)
+            # Zoomed past the decoded resolution of a completely decoded image
+            pbo_width = self._pixbuf_original.get_width()
+            pbo_height = self._pixbuf_original.get_height()
+            if not partial and (pbf_width > pbo_width + 1
+                                or pbf_height > pbo_height + 1):
+                self._load_full_resolution()
+            pixbuf = self._pixbuf_original
+        # Rendered levels of partially decoded images and of frames of playing
+        # animations must not be reused
+        changing = partial or bool(self._timer_id)
+        if changing or self._pyramid_partial or self._pyramid is None \
+                or self._pyramid.pixbuf is not pixbuf:
+            self._pyramid = TilePyramid(pixbuf)
+        self._pyramid_partial = changing
+        # Only render the visible part of very large images
+        self._tiled = width * height > self.TILE_THRESHOLD
+        self.set_size_request(width, height)
+        self.queue_draw()
         # Update the statusbar
         self._app["statusbar"].update_info()
 
+    def do_draw(self, cr):
+        """Draw the exposed region of the image.
+
+        The image is centered in the allocation and zoom, rotations and flips
+        are applied as transformation matrix of the cairo context.
+        """
+        if self._pyramid is None:
+            return False
+        width, height = self.get_displayed_size()
+        pixbuf = self._pyramid.pixbuf
+        pbf_width, pbf_height = self._get_unrotated_size(width, height)
+        zoom = pbf_width / pixbuf.get_width()
+        # Visible region of the main window in device coordinates
+        h_adj = self._app["main_window"].get_hadjustment()
+        v_adj = self._app["main_window"].get_vadjustment()
+        x_1, y_1 = h_adj.get_value(), v_adj.get_value()
+        x_2, y_2 = x_1 + h_adj.get_page_size(), y_1 + v_adj.get_page_size()
+        viewport = [cr.user_to_device(x_1, y_1), cr.user_to_device(x_2, y_2)]
+        # Center the image if it is smaller than the allocation
+        allocation = self.get_allocation()
+        cr.translate(max(0, (allocation.width - width) // 2),
+                     max(0, (allocation.height - height) // 2))
+        # Frames of playing animations are scaled once and reused
+        if self._timer_id and not self._tiled:
+            cr.transform(self._get_matrix(pbf_width, pbf_height, 1))
+            cr.set_source_surface(self._frames.get(pbf_width, pbf_height),
+                                  0, 0)
+            cr.paint()
+            return False
+        if not self._tiled:
+            surface, level_scale = self._pyramid.get_surface(zoom)
+            cr.transform(self._get_matrix(surface.get_width(),
+                                          surface.get_height(),
+                                          zoom / level_scale))
+            cr.set_source_surface(surface, 0, 0)
+            cr.get_source().set_filter(
+                cairo.FILTER_FAST if self._fast else cairo.FILTER_GOOD)
+            cr.paint()
+            return False
+        # Tiles are rendered at the zoom level and only need to be rotated
+        cr.transform(self._get_matrix(pbf_width, pbf_height, 1))
+        # Drop tiles which left the visible region of the main window
+        viewport = [cr.device_to_user(*point) for point in viewport]
+        x_values = [point[0] for point in viewport]
+        y_values = [point[1] for point in viewport]
+        self._pyramid.evict(zoom, min(x_values), min(y_values),
+                            max(x_values) - min(x_values),
+                            max(y_values) - min(y_values))
+        # Render and paint the tiles in the exposed region
+        x_1, y_1, x_2, y_2 = cr.clip_extents()
+        for x, y, tile in self._pyramid.get_tiles(
+                zoom, x_1, y_1, x_2 - x_1, y_2 - y_1, self._fast):
+            Gdk.cairo_set_source_pixbuf(cr, tile, x, y)
+            cr.rectangle(x, y, tile.get_width(), tile.get_height())
+            cr.fill()
+        return False
+
+    def defer_quality(self):
+        """Draw in fast quality until input was idle for quality_delay ms.
+
+        Any pending redraw in high quality is cancelled so rapid zooming,
+        scrolling or resizing never waits for a high quality render.
+        """
+        delay = settings["quality_delay"].get_value()
+        if self._quality_id:
+            GLib.source_remove(self._quality_id)
+            self._quality_id = 0
+        self._fast = delay > 0
+        if self._fast:
+            self._quality_id = GLib.timeout_add(delay, self._draw_quality)
+
+    def _draw_quality(self):
+        self._quality_id = 0
+        self._fast = False
+        self.queue_draw()
+        return False  # Only run once
+
+    def _get_matrix(self, width, height, scale):
+        """Return the matrix mapping an image onto the displayed image.
+
+        Args:
+            width: Width of the unrotated image.
+            height: Height of the unrotated image.
+            scale: Zoom factor to apply before rotating.
+        Return:
+            cairo.Matrix applying zoom, rotations and flips.
+        """
+        matrix = cairo.Matrix(scale, 0, 0, scale, 0, 0)
+        width, height = width * scale, height * scale
+        for change, arg in self._transformations:
+            if change == "rotate":
+                # Counter-clockwise as GdkPixbuf.Pixbuf.rotate_simple(90)
+                for _ in range(arg % 4):
+                    matrix = matrix.multiply(
+                        cairo.Matrix(0, -1, 1, 0, 0, width))
+                    width, height = height, width
+            elif change == "flip" and arg:
+                matrix = matrix.multiply(cairo.Matrix(-1, 0, 0, 1, width, 0))
+            elif change == "flip":
+                matrix = matrix.multiply(cairo.Matrix(1, 0, 0, -1, 0, height))
+        return matrix
+
+    def _is_rotated(self):
+        """Return True if width and height of the image are swapped."""
+        return sum(arg for change, arg in self._transformations
+                   if change == "rotate") % 2 == 1
+
+    def _get_unrotated_size(self, width, height):
+        return (height, width) if self._is_rotated() else (width, height)
+
     def zoom_delta(self, zoom_in=True, step=1):
         """Zoom the image by delta percent.
 
         Args:
             zoom_in: If True zoom in, else zoom out.
         """
-        delta = 0.25
+        delta = self.ZOOM_DELTA
         # Allow user steps
         step = self._app["eventhandler"].num_receive(step, True)
         if isinstance(step, str):
@@ -95,6 +298,8 @@ class Image(Gtk.Image):
             self.zoom_percent = self.zoom_percent * (1 + delta * step)
         else:
             self.zoom_percent = self.zoom_percent / (1 + delta * step)
+        # Zoom steps follow each other quickly
+        self.defer_quality()
         self._catch_unreasonable_zoom_and_update(fallback_zoom)
         self.fit_image = "user"
 
@@ -164,9 +369,13 @@ class Image(Gtk.Image):
         if self._timer_id:
             self.zoom_percent = 1
             self._pause_gif()
-        # Load file
+        # Show a cached image instantly, otherwise load file
         try:
-            self._load(path)
+            pixbuf = self._cache.get(path)
+            if pixbuf:
+                self._show_cached(pixbuf, self._cache.get_original_size(path))
+            else:
+                self._load(path)
         except (PermissionError, FileNotFoundError):
             self._app.remove_path(path)
             self.move_pos(False)
@@ -213,9 +422,19 @@ class Image(Gtk.Image):
         Return:
             Zoom percentage.
         """
-        # Size of the file
-        pbo_width = self._pixbuf_original.get_width()
-        pbo_height = self._pixbuf_original.get_height()
+        return self._get_zoom_percent_to_fit(*self.get_original_size(),
+                                             fit=fit)
+
+    def _get_zoom_percent_to_fit(self, pbo_width, pbo_height, fit="fit"):
+        """Get the zoom factor fitting an image of a given size to the window.
+
+        Args:
+            pbo_width: Width of the image at full resolution.
+            pbo_height: Height of the image at full resolution.
+            fit: How to fit image.
+        Return:
+            Zoom percentage.
+        """
         # Maximum size respecting overzoom
         max_width = pbo_width * settings["overzoom"].get_value()
         max_height = pbo_height * settings["overzoom"].get_value()
@@ -241,16 +460,15 @@ class Image(Gtk.Image):
             fallback_zoom: Zoom percentage to fall back to if the zoom
                 percentage is unreasonable.
         """
-        orig_width = self._pixbuf_original.get_width()
-        orig_height = self._pixbuf_original.get_height()
+        orig_width, orig_height = self.get_original_size()
         new_width = orig_width * self.zoom_percent
         new_height = orig_height * self.zoom_percent
         min_width = max(16, orig_width * 0.05)
         min_height = max(16, orig_height * 0.05)
         max_width = min(self._app["window"].get_size()[0] * 10,
-                        self._pixbuf_original.get_width() * 20)
+                        orig_width * 20)
         max_height = min(self._app["window"].get_size()[1] * 10,
-                         self._pixbuf_original.get_height() * 20)
+                         orig_height * 20)
         # Image too small or too large
         if new_height < min_height or new_width < min_width \
                 or new_height > max_height or new_width > max_width:
@@ -265,15 +483,29 @@ class Image(Gtk.Image):
     def _play_gif(self):
         """Run the animation of a gif."""
         self._pixbuf_original = self._pixbuf_iter.get_pixbuf()
+        index = self._frame_index % self._frame_count \
+            if self._frame_count else None
+        self._frames.set_frame(self._pixbuf_original, index)
         GLib.idle_add(self._update)
-        if self._pixbuf_iter.advance():
-            # Clear old timer
-            if self._timer_id:
-                GLib.source_remove(self._timer_id)
-            # Add new timer if the gif is not static
-            delay = self._pixbuf_iter.get_delay_time()
-            self._timer_id = GLib.timeout_add(delay, self._play_gif) \
-                if delay >= 0 else 0
+        # Clear old timer
+        if self._timer_id:
+            GLib.source_remove(self._timer_id)
+        # Show the frame for its delay, static gifs stop here
+        delay = self._pixbuf_iter.get_delay_time()
+        if delay < 0:
+            self._timer_id = 0
+            return
+        self._animation_time += delay
+        if self._pixbuf_iter.advance(self._get_animation_time()):
+            self._frame_index += 1
+        self._timer_id = GLib.timeout_add(delay, self._play_gif)
+
+    def _get_animation_time(self):
+        """Return _animation_time as GLib.TimeVal for the iter."""
+        timeval = GLib.TimeVal()
+        timeval.tv_sec = self._animation_time // 1000
+        timeval.tv_usec = self._animation_time % 1000 * 1000
+        return timeval
 
     def _pause_gif(self):
         """Pause a gif or show initial image."""
@@ -281,8 +513,8 @@ class Image(Gtk.Image):
             GLib.source_remove(self._timer_id)
             self._timer_id = 0
         else:
-            image = self._pixbuf_iter.get_pixbuf()
-            self.set_from_pixbuf(image)
+            self._pixbuf_original = self._pixbuf_iter.get_pixbuf()
+            self._update()
 
     def _get_available_size(self):
         """Receive size not occupied by other Widgets.
@@ -301,64 +533,335 @@ class Image(Gtk.Image):
             size = (size[0], size[1] - self._app["statusbar"].get_bar_height())
         return size
 
+    def get_original_size(self):
+        """Return the full resolution size of the image as displayed."""
+        return self._get_unrotated_size(*self._original_size)
+
+    def get_displayed_size(self):
+        """Return the size of the zoomed image as displayed."""
+        width, height = self.get_original_size()
+        return int(width * self.zoom_percent), int(height * self.zoom_percent)
+
+    def get_decode_scale(self, width, height, fit="overzoom"):
+        """Return the scale at which an image should be decoded.
+
+        Images larger than the available space are decoded at the resolution
+        needed to fit them. The full resolution is decoded on demand when
+        zooming in further.
+
+        Args:
+            width: Full resolution width of the image.
+            height: Full resolution height of the image.
+            fit: How the image is going to be fit.
+        Return:
+            Scale between 0 and 1.
+        """
+        if fit == "user":
+            return 1
+        return min(1, self._get_zoom_percent_to_fit(width, height, fit))
+
     def _load(self, path):
         """Actual implementation to load an image from path."""
-        loader = GdkPixbuf.PixbufLoader()
+        key = get_file_key(path)
+        self._cancel_jobs()
         self._identifier += 1
-        if is_animation(path):
-            loader.connect("area-prepared", self._set_image_anim)
+        self._transformations = []
+        self._full_resolution_pending = False
+        self._faulty_image = True
+        self._frames.clear()
+        self._placeholder = False
+        self._size = self._get_available_size()
+        # Show a thumbnail of large files until they are decoded
+        if key[1] >= self.PLACEHOLDER_THRESHOLD:
+            self._jobs.append(self._scheduler.submit(
+                self._placeholder_thread, path, self._identifier,
+                priority=DecodeScheduler.CURRENT))
+        self._jobs.append(self._scheduler.submit(
+            self._load_thread, path, key, self._identifier, self.fit_image,
+            priority=DecodeScheduler.CURRENT))
+
+    def _cancel_jobs(self):
+        """Cancel all decodes of the previous image."""
+        for job in self._jobs:
+            job.cancel()
+        self._jobs = []
+
+    def _call_if_current(self, image_id, function, *args):
+        """Call function from the main loop if image_id is still shown."""
+        if self._identifier == image_id:
+            function(*args)
+        return False  # Only run once
+
+    def _load_thread(self, job, path, key, image_id, fit):
+        """Stream path into a PixbufLoader until done or cancelled.
+
+        All results are handed to the main loop via GLib.idle_add.
+        """
+        loader = GdkPixbuf.PixbufLoader()
+        original_size = []
+        animation = is_animation(path)
+        if animation:
+            loader.connect("area-prepared", self._on_animation_prepared,
+                           image_id)
         else:
-            loader.connect("area-prepared", self._set_image_pixbuf)
-            loader.connect("closed",
-                           self._finish_image_pixbuf, self._identifier)
-        load_thread = Thread(target=self._load_thread, args=(loader, path),
-                             daemon=True)
-        # Daemon is set to True so the program can exit with "q" immediately if
-        # only a loading thread is left
-        load_thread.start()
-
-    def _load_thread(self, loader, path):
+            loader.connect("size-prepared", self._on_size_prepared, image_id,
+                           fit, original_size)
+            loader.connect("area-prepared", self._on_area_prepared, image_id)
+            loader.connect("area-updated", self._on_area_updated, image_id,
+                           [time()])
         # The try ... except wrapper and the _faulty_image attribute are used to
         # catch weird images that break GdkPixbufLoader but work otherwise
         # See https://github.com/karlch/vimiv/issues/49 for more information
         try:
-            self._faulty_image = True
             with open(path, "rb") as f:
-                image_bytes = f.read()
-                loader.write(image_bytes)
-            self._faulty_image = False
+                for chunk in self._read_chunks(f):
+                    if job.cancelled:
+                        break
+                    loader.write(chunk)
             loader.close()
         except GLib.GError:
-            self._pixbuf_original = GdkPixbuf.Pixbuf.new_from_file(path)
-            self._faulty_image = False
-            self._set_image_pixbuf()
-            GLib.idle_add(self._update)
-
-    def _set_image_pixbuf(self, loader=None):
-        if loader:
-            self._pixbuf_original = loader.get_pixbuf()
+            if job.cancelled:
+                return
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+            GLib.idle_add(self._call_if_current, image_id,
+                          self._finish_faulty_image, pixbuf)
+            return
+        if job.cancelled:
+            return
+        if animation:
+            # Frames are cached by their index within the loop
+            GLib.idle_add(self._call_if_current, image_id,
+                          self._set_frame_count, count_gif_frames(path))
+        pixbuf = None if animation else loader.get_pixbuf()
+        if pixbuf:
+            self._cache.add(path, key, pixbuf, tuple(original_size) or None)
+        GLib.idle_add(self._call_if_current, image_id,
+                      self._finish_image_pixbuf, pixbuf)
+
+    def _placeholder_thread(self, job, path, image_id):
+        """Load the thumbnail or the exif preview of path as placeholder."""
+        try:
+            if is_animation(path) or is_svg(path):
+                return
+            thumbnail = self._thumbnail_store.get_existing_thumbnail(path)
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(thumbnail) if thumbnail \
+                else get_exif_preview(path)
+            _, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
+        except (GLib.GError, KeyError, OSError):
+            return
+        if pixbuf and width and height and not job.cancelled:
+            GLib.idle_add(self._call_if_current, image_id,
+                          self._show_placeholder, pixbuf, width, height)
+
+    def _read_chunks(self, f):
+        """Yield the content of the opened file f in chunks.
+
+        Large files are mapped into memory so they are never read completely
+        into a python bytes object.
+        """
+        size = os.fstat(f.fileno()).st_size
+        if size >= self.MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, self.CHUNK_SIZE):
+                    yield mapped[offset:offset + self.CHUNK_SIZE]
+        else:
+            chunk = f.read(self.CHUNK_SIZE)
+            while chunk:
+                yield chunk
+                chunk = f.read(self.CHUNK_SIZE)
+
+    def _on_size_prepared(self, loader, width, height, image_id, fit,
+                          original_size):
+        """Request the resolution needed to fit the image from the loader.
+
+        Args:
+            original_size: List the full resolution size is stored in for the
+                cache.
+        """
+        original_size[:] = [width, height]
+        scale = self.get_decode_scale(width, height, fit)
+        if scale < 1:
+            loader.set_size(max(1, int(width * scale)),
+                            max(1, int(height * scale)))
+        GLib.idle_add(self._call_if_current, image_id, self._set_original_size,
+                      width, height)
+
+    def _on_area_prepared(self, loader, image_id):
+        GLib.idle_add(self._call_if_current, image_id, self._set_image_pixbuf,
+                      loader.get_pixbuf())
+
+    def _on_area_updated(self, loader, x, y, width, height, image_id,
+                         last_repaint):
+        """Show partially decoded images at a limited rate.
+
+        Args:
+            last_repaint: List containing the time of the last repaint.
+        """
+        now = time()
+        if now - last_repaint[0] > self.REPAINT_INTERVAL:
+            last_repaint[0] = now
+            GLib.idle_add(self._call_if_current, image_id,
+                          self._update_partial)
+
+    def _on_animation_prepared(self, loader, image_id):
+        GLib.idle_add(self._call_if_current, image_id, self._set_image_anim,
+                      loader.get_animation())
+
+    def _update_partial(self):
+        # Keep showing the placeholder until the image is decoded completely
+        if not self._placeholder:
+            self._update(partial=True)
+
+    def _show_placeholder(self, pixbuf, width, height):
+        """Show an upscaled thumbnail while the image is still decoding.
+
+        Args:
+            pixbuf: GdkPixbuf.Pixbuf of the thumbnail.
+            width: Full resolution width of the image.
+            height: Full resolution height of the image.
+        """
+        # The image may have been decoded already
+        if not self._faulty_image:
+            return
+        self._placeholder = True
+        self._original_size = (width, height)
+        self._set_image_pixbuf(pixbuf)
+        self._update(partial=True)
+
+    def _load_full_resolution(self):
+        """Decode the current image at full resolution in the background."""
+        if self._full_resolution_pending:
+            return
+        self._full_resolution_pending = True
+        self._jobs.append(self._scheduler.submit(
+            self._full_resolution_thread, self._app.get_path(),
+            self._identifier, priority=DecodeScheduler.CURRENT))
+
+    def _full_resolution_thread(self, job, path, image_id):
+        try:
+            key = get_file_key(path)
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+        except (GLib.GError, OSError):
+            return
+        self._cache.add(path, key, pixbuf)
+        if not job.cancelled:
+            GLib.idle_add(self._call_if_current, image_id,
+                          self._on_full_resolution_loaded, pixbuf)
+
+    def _on_full_resolution_loaded(self, pixbuf):
+        self._pixbuf_original = pixbuf
+        self._update()
+
+    def _apply_transformations(self, pixbuf):
+        """Return pixbuf with the rotations and flips done since loading."""
+        for change, arg in self._transformations:
+            if change == "rotate":
+                pixbuf = pixbuf.rotate_simple(90 * arg)
+            elif change == "flip":
+                pixbuf = pixbuf.flip(arg)
+        return pixbuf
+
+    def _is_reduced(self):
+        """Return True if the image was not decoded at full resolution."""
+        return self._pixbuf_original.get_width() < self._original_size[0] \
+            or self._pixbuf_original.get_height() < self._original_size[1]
+
+    def _set_original_size(self, width, height):
+        self._original_size = (width, height)
+
+    def _set_image_pixbuf(self, pixbuf=None):
+        if pixbuf:
+            self._pixbuf_original = pixbuf
         self._size = self._get_available_size()
         self.zoom_percent = self.get_zoom_percent_to_fit(self.fit_image)
 
-    def _finish_image_pixbuf(self, loader, image_id):
-        if self._identifier == image_id:
-            GLib.idle_add(self._update)
+    def _finish_image_pixbuf(self, pixbuf=None):
+        # Replace the placeholder
+        if pixbuf:
+            self._pixbuf_original = pixbuf
+        self._placeholder = False
+        self._faulty_image = False
+        if not self._timer_id:
+            self._update()
+        # Prefetch neighbours once the current image is done to not compete
+        self._prefetcher.update()
+
+    def _finish_faulty_image(self, pixbuf):
+        self._original_size = (pixbuf.get_width(), pixbuf.get_height())
+        self._set_image_pixbuf(pixbuf)
+        self._finish_image_pixbuf()
+
+    def _show_cached(self, pixbuf, original_size):
+        """Show an image which was already decoded.
+
+        Args:
+            pixbuf: The cached GdkPixbuf.Pixbuf.
+            original_size: Full resolution size of the image as stored in the
+                cache, pixbuf may have been decoded at reduced resolution.
+        """
+        self._cancel_jobs()
+        self._identifier += 1
+        self._transformations = []
+        self._full_resolution_pending = False
+        self._faulty_image = False
+        self._frames.clear()
+        self._pixbuf_original = pixbuf
+        self._original_size = original_size
+        self._set_image_pixbuf()
+        self._update()
+        self._prefetcher.update()
 
-    def _set_image_anim(self, loader):
-        self._pixbuf_iter = loader.get_animation().get_iter()
+    def _set_image_anim(self, animation):
+        self._animation_time = 0
+        self._frame_count = None
+        self._frame_index = 0
+        self._pixbuf_iter = animation.get_iter(self._get_animation_time())
         self._pixbuf_original = self._pixbuf_iter.get_pixbuf()
+        self._original_size = (self._pixbuf_original.get_width(),
+                               self._pixbuf_original.get_height())
         self._size = self._get_available_size()
         self.zoom_percent = self.get_zoom_percent_to_fit(self.fit_image)
         if settings["play_animations"].get_value():
-            delay = self._pixbuf_iter.get_delay_time()
-            self._timer_id = GLib.timeout_add(delay, self._play_gif) \
-                if delay >= 0 else 0
+            self._play_gif()
+
+    def _set_frame_count(self, count):
+        """Cache the frames of the animation once their number is known."""
+        self._frame_count = count
 
     def get_pixbuf_original(self):
-        return self._pixbuf_original.copy()
+        """Return a transformed copy of the image at full resolution."""
+        if self._is_reduced():
+            self._pixbuf_original = \
+                GdkPixbuf.Pixbuf.new_from_file(self._app.get_path())
+        return self._apply_transformations(self._pixbuf_original.copy())
+
+    def is_displayed(self):
+        return self._pyramid is not None
+
+    def get_pixbuf(self):
+        """Return the image as it is currently displayed.
+
+        The image is only drawn to the screen so the pixbuf is rendered when
+        calling this function.
+
+        Return:
+            GdkPixbuf.Pixbuf or None if no image was displayed yet.
+        """
+        if self._pyramid is None:
+            return None
+        width, height = self.get_displayed_size()
+        pixbuf = self._apply_transformations(self._pyramid.pixbuf)
+        return pixbuf.scale_simple(width, height,
+                                   GdkPixbuf.InterpType.BILINEAR)
+
+    def show_cache_info(self):
+        self._app["statusbar"].message(self._cache.get_info(), "info")
 
     def set_pixbuf(self, pixbuf):
+        # Transformations were applied by get_pixbuf_original already
+        self._transformations = []
         self._pixbuf_original = pixbuf
+        self._original_size = (pixbuf.get_width(), pixbuf.get_height())
         self._update()
 
     def _on_image_changed(self, transform, change, arg):
@@ -369,16 +872,17 @@ class Image(Gtk.Image):
             change: The type of transformation.
             arg: Argument for the transformation, e.g. cwise for rotate.
         """
-        if change == "rotate":
-            self._pixbuf_original = \
-                self._pixbuf_original.rotate_simple(90 * arg)
-        elif change == "flip":
-            self._pixbuf_original = self._pixbuf_original.flip(arg)
+        # The transformation is applied when drawing
+        self._transformations.append((change, arg))
         if self.fit_image != "user":
             self.zoom_to(0, self.fit_image)
         else:
             self._update()
 
+    def _on_applied_to_file(self, transform, files):
+        for path in files:
+            self._cache.invalidate(path)
+
     def _on_search_completed(self, search, new_pos, last_focused):
         if last_focused == "im":
             self._app["eventhandler"].set_num_str(new_pos + 1)
@@ -4,7 +4,7 @@
 import os
 from multiprocessing.pool import ThreadPool as Pool
 
-from gi.repository import GdkPixbuf, GObject
+from gi.repository import GdkPixbuf, GLib, GObject
 from vimiv.fileactions import edit_supported
 
 # We need the try ... except wrapper here
@@ -43,6 +43,36 @@ def save_pixbuf(pixbuf, filename, update_orientation_tag=False):
         exif.save_file()
 
 
+def get_exif_preview(filename, min_size=0):
+    """Return a preview image embedded in the exif data of a file.
+
+    Args:
+        filename: Name of the image to get the preview of.
+        min_size: If given, return the smallest preview whose longer side is
+            at least min_size large instead of the largest preview.
+    Return:
+        GdkPixbuf.Pixbuf or None if there is no suitable preview or no exif
+        support.
+    """
+    if not _has_exif:
+        return None
+    try:
+        exif = GExiv2.Metadata(filename)
+        properties = [prop for prop in exif.get_preview_properties()
+                      if max(prop.get_width(), prop.get_height()) >= min_size]
+        if not properties:
+            return None
+        pick = min if min_size else max
+        preview = pick(properties,
+                       key=lambda prop: prop.get_width() * prop.get_height())
+        loader = GdkPixbuf.PixbufLoader()
+        loader.write(exif.get_preview_image(preview).get_data())
+        loader.close()
+        return loader.get_pixbuf()
+    except GLib.GError:
+        return None
+
+
 def rotate_file(filename, cwise):
     """Rotate a file and save it.
 
@@ -243,7 +243,7 @@ class Library(Gtk.TreeView):
                 markup_string += "  →  " + os.path.realpath(name)
             if os.path.isdir(name):
                 markup_string = "<b>" + markup_string + "</b>"
-            if name in self._app["commandline"].search.results:
+            if name in self._app["commandline"].search.result_set:
                 # This is a MarkupSetting not a BoolSetting as pylint thinks
                 # pylint: disable=no-member
                 markup_string = settings["markup"].surround(markup_string)
@@ -342,7 +342,7 @@ class Library(Gtk.TreeView):
                 marked_string = "[*]"
             if os.path.isdir(fil):
                 markup_string = "<b>" + markup_string + "</b>"
-            if fil in self._app["commandline"].search.results:
+            if fil in self._app["commandline"].search.result_set:
                 # This is a MarkupSetting not a BoolSetting as pylint thinks
                 # pylint: disable=no-member
                 markup_string = settings["markup"].surround(markup_string)
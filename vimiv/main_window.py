@@ -2,7 +2,7 @@
 """Gtk.ScrolledWindow class which is usually the main window of vimiv.
 
 The ScrolledWindow can either include a Gtk.Image in IMAGE mode or a
-Gtk.IconView in THUMBNAIL mode.
+ThumbnailGrid in THUMBNAIL mode.
 """
 
 import os
@@ -14,7 +14,7 @@ from vimiv.thumbnail import Thumbnail
 
 
 class MainWindow(Gtk.ScrolledWindow):
-    """Main window of vimiv containing either an Image or an IconView.
+    """Main window of vimiv containing either an Image or a ThumbnailGrid.
 
     Attributes:
         image: Vimiv Image class which may be displayed.
@@ -40,6 +40,8 @@ class MainWindow(Gtk.ScrolledWindow):
         # Connect signals
         self._app.connect("widget-layout-changed", self._on_widgets_changed)
         self._app.connect("paths-changed", self._on_paths_changed)
+        self.get_hadjustment().connect("value-changed", self._on_scrolled)
+        self.get_vadjustment().connect("value-changed", self._on_scrolled)
 
     def switch_to_child(self, new_child):
         """Switch the widget displayed in the main window.
@@ -114,11 +116,21 @@ class MainWindow(Gtk.ScrolledWindow):
         self.set_hadjustment(h_adj)
         self.set_vadjustment(v_adj)
 
+    def _on_scrolled(self, adjustment):
+        # Scroll the image in fast quality
+        if not self.thumbnail.toggled:
+            self.image.defer_quality()
+        # Load the thumbnails scrolled into view first
+        else:
+            self.thumbnail.update_visible()
+
     def _on_widgets_changed(self, app, widget):
         """Recalculate thumbnails or rezoom image when the layout changed."""
         if self.thumbnail.toggled:
             self.thumbnail.calculate_columns()
         elif self._app.get_paths() and self.image.fit_image != "user":
+            # Resizing the window rezooms continuously
+            self.image.defer_quality()
             self.image.zoom_to(0, self.image.fit_image)
 
     def _on_paths_changed(self, app, transform):
@@ -0,0 +1,205 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Memory bounded cache of decoded images."""
+
+import collections
+import os
+from threading import Lock
+
+from vimiv.helpers import sizeof_fmt
+from vimiv.settings import settings
+
+
+def get_file_key(path):
+    """Return the key used to check if a cached image is still current.
+
+    This should be retrieved before reading the file so changes during decoding
+    invalidate the cached image.
+
+    Args:
+        path: Path of the image file.
+    Return:
+        Tuple of modification time in nanoseconds and size of the file.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PixbufCache(object):
+    """Least recently used cache of decoded images with a memory budget.
+
+    Images are keyed by path and validated against the modification time and
+    the size of the file. The budget in MB is defined by a setting, the number
+    of images may additionally be limited by a second setting.
+
+    Attributes:
+        hits: Number of lookups which returned a cached image.
+        misses: Number of lookups which did not.
+        evictions: Number of images removed to stay within the budget.
+
+        _budget_setting: Name of the setting defining the budget in MB.
+        _entries: OrderedDict of cached images, least recently used first.
+            Key: Path; Item: Tuple of file key, GdkPixbuf.Pixbuf and the full
+            resolution size of the image.
+        _entries_setting: Name of the setting defining the maximum number of
+            images or None if it is not limited.
+        _lock: Lock as images may be invalidated from other threads.
+        _name: Name of the cache used in the summary of its usage.
+        _size: Memory occupied by all cached images in bytes.
+    """
+
+    def __init__(self, budget_setting="image_cache_mb", entries_setting=None,
+                 name="Image cache"):
+        """Initialize attributes.
+
+        Args:
+            budget_setting: Name of the setting defining the budget in MB.
+            entries_setting: Name of the setting defining the maximum number
+                of images or None if it is not limited.
+            name: Name of the cache used in the summary of its usage.
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._budget_setting = budget_setting
+        self._entries = collections.OrderedDict()
+        self._entries_setting = entries_setting
+        self._lock = Lock()
+        self._name = name
+        self._size = 0
+        settings.connect("changed", self._on_settings_changed)
+
+    def get(self, path):
+        """Return the cached image of path if it is still current.
+
+        Args:
+            path: Path of the image file.
+        Return:
+            GdkPixbuf.Pixbuf or None if there is no current image cached.
+        """
+        try:
+            key = get_file_key(path)
+        except OSError:  # Deleted files are never current
+            key = None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and key is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                self._remove(path)
+            self.misses += 1
+        return None
+
+    def is_current(self, path):
+        """Return True if a current image of path is cached.
+
+        Unlike get this neither counts as a lookup nor marks the image as used.
+        """
+        try:
+            key = get_file_key(path)
+        except OSError:
+            return False
+        with self._lock:
+            entry = self._entries.get(path)
+            return entry is not None and entry[0] == key
+
+    def add(self, path, key, pixbuf, original_size=None):
+        """Add a decoded image to the cache evicting old ones if necessary.
+
+        Args:
+            path: Path of the image file.
+            key: File key of path retrieved before decoding, None if it could
+                not be retrieved.
+            pixbuf: The decoded GdkPixbuf.Pixbuf.
+            original_size: Tuple of the full resolution width and height if
+                pixbuf was decoded at reduced resolution.
+        """
+        size = self.get_pixbuf_size(pixbuf)
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+            # Images without a key could never be validated
+            if key is None:
+                return
+            # Images larger than the whole budget are never cached
+            if size > self.get_budget():
+                return
+            if original_size is None:
+                original_size = (pixbuf.get_width(), pixbuf.get_height())
+            self._entries[path] = (key, pixbuf, original_size)
+            self._size += size
+            self._trim()
+
+    def get_original_size(self, path):
+        """Return the full resolution size of the cached image of path.
+
+        Images may be cached at reduced resolution, the size is stored so it
+        is not read from the file again.
+
+        Args:
+            path: Path of the image file.
+        Return:
+            Tuple of width and height or None if path is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            return entry[2] if entry else None
+
+    def invalidate(self, path):
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_budget(self):
+        return settings[self._budget_setting].get_value() * 1024 * 1024
+
+    def get_max_entries(self):
+        """Return the maximum number of images or None if not limited."""
+        if self._entries_setting is None:
+            return None
+        return settings[self._entries_setting].get_value()
+
+    def get_info(self):
+        """Return a summary of the cache usage to tune the budget."""
+        info = "%s: %d hits, %d misses, %d evictions, %s of %s used" \
+            % (self._name, self.hits, self.misses, self.evictions,
+               sizeof_fmt(self._size), sizeof_fmt(self.get_budget()))
+        if self._entries_setting is not None:
+            info += ", %d of %d entries" \
+                % (len(self._entries), self.get_max_entries())
+        return info
+
+    @staticmethod
+    def get_pixbuf_size(pixbuf):
+        return pixbuf.get_rowstride() * pixbuf.get_height()
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, path):
+        _, pixbuf, _ = self._entries.pop(path)
+        self._size -= self.get_pixbuf_size(pixbuf)
+
+    def _trim(self):
+        """Evict least recently used images until the budget is respected."""
+        budget = self.get_budget()
+        max_entries = self.get_max_entries()
+        while self._entries and (self._size > budget or max_entries is not None
+                                 and len(self._entries) > max_entries):
+            path = next(iter(self._entries))
+            self._remove(path)
+            self.evictions += 1
+
+    def _on_settings_changed(self, new_settings, setting):
+        if setting in [self._budget_setting, self._entries_setting]:
+            with self._lock:
+                self._trim()
@@ -0,0 +1,132 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Prefetch the images surrounding the current one in image mode."""
+
+from gi.repository import GdkPixbuf, GLib
+from vimiv.pixbuf_cache import get_file_key
+from vimiv.settings import settings
+
+
+class Prefetcher(object):
+    """Decode the neighbours of the current image in the background.
+
+    The amount of neighbours in each direction is defined by the
+    prefetch_amount setting. Decodes run in the DecodeScheduler shared with
+    Image at low priority. Decoded images are stored in the PixbufCache shared
+    with Image. All callbacks are run in the main loop.
+
+    Attributes:
+        _app: The main vimiv application to interact with.
+        _cache: PixbufCache in which decoded images are stored.
+        _pending: Dictionary of paths which are currently being decoded.
+            Key: Path; Item: DecodeJob.
+        _scheduler: DecodeScheduler running the decodes.
+        _skipped: Dictionary of animations and images which failed to decode
+            in the window so they are not decoded again.
+            Key: Path; Item: File key of the image when it was skipped.
+    """
+
+    def __init__(self, app, cache, scheduler):
+        """Initialize attributes.
+
+        Args:
+            app: The main vimiv application to interact with.
+            cache: PixbufCache in which decoded images are stored.
+            scheduler: DecodeScheduler running the decodes.
+        """
+        self._app = app
+        self._cache = cache
+        self._scheduler = scheduler
+        self._pending = {}
+        self._skipped = {}
+
+    def update(self):
+        """Slide the prefetch window to the current position.
+
+        Neighbours which are not cached yet are decoded. Decodes of images
+        which left the window are cancelled. Decoded images which left the
+        window are evicted by the cache once the budget is exceeded.
+        """
+        window = self._get_window()
+        for path in list(self._pending.keys()):
+            if path not in window:
+                self._pending.pop(path).cancel()
+        self._skipped = {path: key for path, key in self._skipped.items()
+                         if path in window}
+        for path in window:
+            if path not in self._cache and path not in self._pending:
+                self._submit(path)
+
+    def _submit(self, path):
+        """Decode path unless it was skipped before and did not change.
+
+        The file is inspected here so the decode scale is calculated in the
+        main loop.
+        """
+        try:
+            key = get_file_key(path)
+            if self._skipped.get(path) == key:
+                return
+            info, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
+        except (GLib.GError, OSError):
+            return
+        # Animations are loaded as such by Image, a single frame is useless
+        if info is None or "gif" in info.get_extensions():
+            self._skipped[path] = key
+            return
+        scale = self._app["image"].get_decode_scale(width, height) \
+            if width and height else 1
+        size = (max(1, int(width * scale)), max(1, int(height * scale))) \
+            if scale < 1 else None
+        original_size = (width, height) if width and height else None
+        self._pending[path] = self._scheduler.submit(
+            self._decode_thread, path, key, size, original_size)
+
+    def _get_window(self):
+        """Return the paths surrounding the current image.
+
+        Next images come first as moving forward is the common case. Moving
+        across the end of the filelist wraps around unless shuffle is enabled
+        as the filelist is reshuffled in that case.
+
+        Return:
+            List of paths to prefetch.
+        """
+        paths = self._app.get_paths()
+        amount = settings["prefetch_amount"].get_value()
+        if not paths or not amount:
+            return []
+        index = self._app.get_index()
+        wrap_forward = not settings["shuffle"].get_value()
+        window = []
+        for delta in range(1, amount + 1):
+            for position in [index + delta, index - delta]:
+                if position >= len(paths) and not wrap_forward:
+                    continue
+                path = paths[position % len(paths)]
+                if path != paths[index] and path not in window:
+                    window.append(path)
+        return window
+
+    def _decode_thread(self, job, path, key, size, original_size):
+        """Decode path at size or at full resolution if size is None."""
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path) if size is None \
+                else GdkPixbuf.Pixbuf.new_from_file_at_scale(path, *size,
+                                                             True)
+        except (GLib.GError, OSError):
+            pixbuf = None
+        if not job.cancelled:
+            GLib.idle_add(self._on_decoded, job, path, key, pixbuf,
+                          original_size)
+
+    def _on_decoded(self, job, path, key, pixbuf, original_size):
+        # The job may have been cancelled while handing over the result
+        if self._pending.get(path) is not job:
+            return
+        del self._pending[path]
+        if pixbuf is None:
+            self._skipped[path] = key
+            return
+        # The window may have moved on while decoding
+        if path in self._get_window():
+            self._cache.add(path, key, pixbuf, original_size)
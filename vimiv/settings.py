@@ -225,8 +225,17 @@ class SettingStorage(GObject.Object):
             BoolSetting("copy_to_primary", False),
             IntSetting("commandline_padding", 6),
             IntSetting("thumb_padding", 10),
+            BoolSetting("thumbnail_processes", False),
+            BoolSetting("thumbnail_index", False),
+            IntSetting("thumbnail_gc_mb", 1024),
+            IntSetting("thumbnail_cache_mb", 128),
+            IntSetting("thumbnail_cache_entries", 2000),
             IntSetting("completion_height", 200),
             BoolSetting("play_animations", True),
+            IntSetting("prefetch_amount", 1),
+            IntSetting("image_cache_mb", 512),
+            IntSetting("animation_cache_mb", 128),
+            IntSetting("quality_delay", 150),
             BoolSetting("start_show_library", False),
             IntSetting("library_width", 300),
             BoolSetting("expand_lib", True),
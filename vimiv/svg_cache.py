@@ -0,0 +1,108 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Cache of rasterised svg images."""
+
+import collections
+from threading import Lock
+
+from gi.repository import GdkPixbuf, GLib
+from vimiv.decode_scheduler import DecodeScheduler
+from vimiv.pixbuf_cache import get_file_key
+
+
+class SvgCache(object):
+    """Least recently used cache of svgs rasterised at different heights.
+
+    Rasters are keyed by path and height and validated against the
+    modification time and the size of the file. Heights of neighbouring zoom
+    steps can be rendered in the background so zooming is instant.
+
+    Attributes:
+        _entries: OrderedDict of rasters, least recently used first.
+            Key: Tuple of path and height; Item: Tuple of file key and
+            GdkPixbuf.Pixbuf.
+        _jobs: Dictionary of rasters rendered in the background.
+            Key: Tuple of path and height; Item: DecodeJob.
+        _lock: Lock as rasters are added from other threads.
+        _scheduler: DecodeScheduler rendering in the background.
+    """
+
+    # Maximum number of rasters kept
+    MAX_ENTRIES = 8
+
+    def __init__(self, scheduler):
+        """Initialize attributes.
+
+        Args:
+            scheduler: DecodeScheduler rendering in the background.
+        """
+        self._entries = collections.OrderedDict()
+        self._jobs = {}
+        self._lock = Lock()
+        self._scheduler = scheduler
+
+    def get(self, path, height):
+        """Return path rasterised at height, rendering it if necessary.
+
+        Args:
+            path: Path of the svg file.
+            height: Height to rasterise the svg at.
+        Return:
+            GdkPixbuf.Pixbuf of the rasterised svg.
+        """
+        key = get_file_key(path)
+        with self._lock:
+            entry = self._entries.get((path, height))
+            if entry and entry[0] == key:
+                self._entries.move_to_end((path, height))
+                return entry[1]
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, -1, height,
+                                                         True)
+        self._add(path, height, key, pixbuf)
+        return pixbuf
+
+    def prerender(self, path, heights):
+        """Render path at heights in the background.
+
+        Renders which were requested before and did not start yet are
+        cancelled.
+
+        Args:
+            path: Path of the svg file.
+            heights: List of heights to rasterise the svg at.
+        """
+        for job in self._jobs.values():
+            job.cancel()
+        self._jobs = {}
+        for height in heights:
+            if height > 0 and (path, height) not in self._entries:
+                self._jobs[(path, height)] = self._scheduler.submit(
+                    self._render_thread, path, height,
+                    priority=DecodeScheduler.PREFETCH)
+
+    def __contains__(self, path_height):
+        return path_height in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _render_thread(self, job, path, height):
+        try:
+            key = get_file_key(path)
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, -1, height,
+                                                             True)
+        except (GLib.GError, OSError):
+            return
+        if not job.cancelled:
+            self._add(path, height, key, pixbuf)
+
+    def _add(self, path, height, key, pixbuf):
+        with self._lock:
+            # Rasters of a changed file are outdated
+            for outdated in [entry for entry in self._entries
+                             if entry[0] == path
+                             and self._entries[entry][0] != key]:
+                del self._entries[outdated]
+            self._entries[(path, height)] = (key, pixbuf)
+            self._entries.move_to_end((path, height))
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
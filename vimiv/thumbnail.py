@@ -3,24 +3,44 @@
 
 import os
 from math import floor
+from threading import Thread
 
-from gi.repository import GdkPixbuf, GLib, Gtk
+from gi.repository import GdkPixbuf, GLib
+from vimiv.helpers import sizeof_fmt
 from vimiv.settings import settings
+from vimiv.thumbnail_grid import ThumbnailGrid
 from vimiv.thumbnail_manager import ThumbnailManager
+from vimiv.thumbnail_scheduler import ThumbnailScheduler
 
 
-class Thumbnail(Gtk.IconView):
+class Thumbnail(ThumbnailGrid):
     """Thumbnail class for vimiv.
 
-    Includes the iconview with the thumbnails and all actions that apply to it.
+    Includes the grid with the thumbnails and all actions that apply to it.
+    Pixbufs and names are only kept for the thumbnails close to the visible
+    region.
 
     Attributes:
         toggled: If True, thumbnail mode is open.
 
         _app: The main vimiv application to interact with.
+        _basenames: Dictionary mapping basenames to the list of their paths.
+        _default_pixbuf: Tuple of the size and the pixbuf shown while
+            thumbnails are loaded.
+        _highlighted: Set of basenames highlighted as search results.
         _last_focused: Widget that was focused before thumbnail.
-        _liststore: Gtk.ListStore containing thumbnail pixbufs and names.
+        _loaded: Set of paths whose thumbnail is shown at _loaded_size.
+        _loaded_size: Size of the thumbnails shown.
+        _marked: Set of the marked files, None if marks changed since.
         _markup: Markup string used to highlight search results.
+        _names: Dictionary mapping paths to their displayed name.
+        _pixbufs: Dictionary mapping paths to their thumbnail.
+        _scheduler: ThumbnailScheduler loading visible thumbnails first.
+        _row_paths: List of the paths of the thumbnails.
+        _rows: Dictionary mapping paths to their index.
+        _transformed: Set of files transformed while thumbnail mode was closed.
+        _update_id: ID of the GLib idle updating the visible region, None if
+            no update is pending.
         _thumbnail_manager: ThumbnailManager class to create and receive
             thumbnail files.
         _timer_id: ID of the currently running GLib.Timeout.
@@ -34,7 +54,7 @@ class Thumbnail(Gtk.IconView):
         Args:
             app: The main application class to interact with.
         """
-        super(Thumbnail, self).__init__()
+        super(Thumbnail, self).__init__(self.get_item)
         self._app = app
 
         # Settings
@@ -47,21 +67,31 @@ class Thumbnail(Gtk.IconView):
         self._zoom_levels = [(64, 64), (128, 128), (256, 256), (512, 512)]
         self._zoom_level_index = self._zoom_levels.index(zoom_level)
 
-        # Create the liststore and iconview
-        self._liststore = Gtk.ListStore(GdkPixbuf.Pixbuf, str)
+        # Configure the grid
         self.connect("item-activated", self._on_activated)
         self.connect("key_press_event",
                      self._app["eventhandler"].on_key_press, "THUMBNAIL")
         self.connect("button_press_event",
                      self._app["eventhandler"].on_click, "THUMBNAIL")
-        self.set_model(self._liststore)
-        self.set_pixbuf_column(0)
-        self.set_markup_column(1)
+        self.connect("size-allocate", self._on_resized)
 
-        self.set_item_width(0)
         self.set_item_padding(padding)
         self.last_focused = ""
         self._thumbnail_manager = ThumbnailManager()
+        self._default_pixbuf = (0, None)
+        self._loaded = set()
+        self._loaded_size = 0
+        self._pixbufs = {}
+        self._names = {}
+        self._marked = None
+        self._row_paths = []
+        self._rows = {}
+        self._basenames = {}
+        self._highlighted = set()
+        self._transformed = set()
+        self._update_id = None
+        self._scheduler = ThumbnailScheduler(self._thumbnail_manager,
+                                             self._on_thumbnail_created)
 
         # Signals
         self._app["mark"].connect("marks-changed", self._on_marks_changed)
@@ -70,15 +100,15 @@ class Thumbnail(Gtk.IconView):
         self._app["commandline"].search.connect("search-completed",
                                                 self._on_search_completed)
 
-    def _on_activated(self, iconview, path):
+    def _on_activated(self, grid, index):
         """Select and show image when thumbnail was activated.
 
         Args:
-            iconview: Gtk.IconView that emitted the signal.
-            path: Gtk.TreePath of the activated thumbnail.
+            grid: ThumbnailGrid that emitted the signal.
+            index: Index of the activated thumbnail.
         """
         self.toggle(True)
-        count = path.get_indices()[0] + 1
+        count = index + 1
         self._app["eventhandler"].num_clear()
         self._app["eventhandler"].set_num_str(count)
         self._app["image"].move_pos()
@@ -92,6 +122,7 @@ class Thumbnail(Gtk.IconView):
         """
         # Close
         if self.toggled:
+            self._scheduler.cancel()
             self._app["main_window"].switch_to_child(self._app["image"])
             if self.last_focused == "im" or select_image:
                 self._app["main_window"].grab_focus()
@@ -100,7 +131,7 @@ class Thumbnail(Gtk.IconView):
                 # Re-expand the library if there is no image and the setting
                 # applies
                 if settings["expand_lib"].get_value() and \
-                        not self._app["image"].get_pixbuf():
+                        not self._app["image"].is_displayed():
                     self._app["main_window"].hide()
                     self._app["library"].set_hexpand(True)
             self.toggled = False
@@ -133,24 +164,16 @@ class Thumbnail(Gtk.IconView):
         Args:
             toggled: If True thumbnail mode is already toggled.
         """
-        # Clean liststore
-        self._liststore.clear()
-
-        # Draw the icon view instead of the image
+        # Draw the thumbnail grid instead of the image
         if not toggled:
             self._app["main_window"].switch_to_child(self)
         # Show the window
         super(Thumbnail, self).show()
         self.toggled = True
 
-        # Add initial placeholder for all thumbnails
-        default_pixbuf = self._get_default_pixbuf()
-        for path in self._app.get_paths():
-            name = self._get_name(path)
-            self._liststore.append([default_pixbuf, name])
-
-        # Generate thumbnails asynchronously
-        self.reload_all(ignore_cache=True)
+        # Thumbnails of the last time are kept
+        self._update_rows()
+        self._update_names()
 
         # Set columns
         self.calculate_columns()
@@ -160,8 +183,18 @@ class Thumbnail(Gtk.IconView):
         pos = self._app.get_index()
         self.move_to_pos(pos)
 
+        # Generate thumbnails asynchronously starting around the focused one,
+        # thumbnails which are still shown are only validated
+        self.reload_all()
+        # Transformations may happen within the resolution of the modification
+        # time stored in thumbnails
+        for path in self._transformed.intersection(self._rows):
+            self.reload(path, ignore_cache=True)
+        self._transformed.clear()
+
     def calculate_columns(self):
         """Calculate how many columns fit into the current window."""
+        self.set_item_size(self.get_zoom_level()[0])
         width = self._app["window"].winsize[0]
         if self._app["library"].grid.is_visible():
             width -= self._app["library"].get_size_request()[0]
@@ -176,55 +209,163 @@ class Thumbnail(Gtk.IconView):
         self.set_columns(columns)
 
     def _get_default_pixbuf(self):
-        default_pixbuf_max = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-            self._thumbnail_manager.default_icon, *self.get_zoom_level(), True)
         size = self.get_zoom_level()[0]
-        return self._thumbnail_manager.scale_pixbuf(default_pixbuf_max, size)
+        if self._default_pixbuf[0] != size:
+            default_pixbuf_max = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+                self._thumbnail_manager.default_icon, size, size, True)
+            self._default_pixbuf = (size, self._thumbnail_manager.scale_pixbuf(
+                default_pixbuf_max, size))
+        return self._default_pixbuf[1]
+
+    def get_item(self, index):
+        """Return the thumbnail and the name of the path at index.
+
+        Names are created when a thumbnail is drawn for the first time.
+        """
+        path = self._row_paths[index]
+        if path not in self._names:
+            self._names[path] = self._get_name(path)
+        pixbuf = self._pixbufs.get(path)
+        if pixbuf is None:
+            pixbuf = self._get_default_pixbuf()
+        return pixbuf, self._names[path]
 
     def reload_all(self, ignore_cache=False):
         size = self.get_zoom_level()[0]
-        for i, path in enumerate(self._app.get_paths()):
-            self._thumbnail_manager.get_thumbnail_at_scale_async(
-                path, size, self._on_thumbnail_created, i,
-                ignore_cache=ignore_cache)
+        if size != self._loaded_size:
+            self._loaded.clear()
+            self._loaded_size = size
+        shown = {self._rows[path] for path in self._loaded}
+        self._scheduler.load_all(self._row_paths, size, ignore_cache,
+                                 self._get_visible_range(), shown)
+
+    def _update_rows(self):
+        """Update the thumbnails to the current paths.
+
+        Thumbnails and names are stored by path so only those of removed
+        paths are dropped.
+
+        Return:
+            List of the indices of inserted paths.
+        """
+        paths = self._app.get_paths()
+        inserted = [index for index, path in enumerate(paths)
+                    if path not in self._rows]
+        self._row_paths = list(paths)
+        self._rows = {path: index for index, path in enumerate(paths)}
+        for stored in [self._pixbufs, self._names]:
+            for path in [path for path in stored if path not in self._rows]:
+                del stored[path]
+        self._loaded.intersection_update(self._rows)
+        self._basenames = {}
+        for path in paths:
+            self._basenames.setdefault(os.path.basename(path), []).append(path)
+        self.set_item_count(len(paths))
+        return inserted
+
+    def update_visible(self):
+        """Load the thumbnails in the visible region first after scrolling.
+
+        Scrolling emits many updates, they are combined into one once the
+        main loop is idle.
+        """
+        if self._update_id is None:
+            self._update_id = GLib.idle_add(self._update_visible)
+
+    def _update_visible(self):
+        """Reorder the scheduler for the visible region.
+
+        Thumbnails which left the region loaded around the visible one are
+        dropped.
+        """
+        self._update_id = None
+        if not self.toggled:
+            return False
+        self._scheduler.update_visible(*self._get_visible_range())
+        first, last = self._scheduler.get_range()
+        hidden = [path for path in self._pixbufs
+                  if not first <= self._rows[path] <= last]
+        for path in hidden:
+            del self._pixbufs[path]
+            self._loaded.discard(path)
+        self._scheduler.unload(self._rows[path] for path in hidden)
+        for path in [path for path in self._names
+                     if not first <= self._rows[path] <= last]:
+            del self._names[path]
+        return False  # Only run once
+
+    def _get_visible_range(self):
+        """Return the first and last visible index.
+
+        Falls back to the focused position if the grid was not drawn yet.
+        """
+        visible = self.get_visible_range()
+        if visible:
+            return visible
+        position = self.get_position()
+        return position, position
+
+    def _on_resized(self, grid, allocation):
+        if self.toggled:
+            self.update_visible()
 
     def _on_thumbnail_created(self, pixbuf, position):
+        # The shown thumbnail is current
+        if pixbuf is None:
+            return
         # Happens if files are deleted while we are trying to create thumbnails
         # for them
-        if len(self._liststore) > position:
-            # Subscripting the liststore directly works fine
-            # pylint: disable=unsubscriptable-object
-            self._liststore[position][0] = pixbuf
-            self.move_to_pos(self.get_position())
+        if len(self._row_paths) > position:
+            path = self._row_paths[position]
+            self._pixbufs[path] = pixbuf
+            self._loaded.add(path)
+            self.queue_draw()
 
     def _get_name(self, filename):
         name = os.path.splitext(os.path.basename(filename))[0]
-        if filename in self._app["mark"].marked:
+        if self._marked is None:
+            self._marked = set(self._app["mark"].marked)
+        if filename in self._marked:
             name += " [*]"
+        if os.path.basename(filename) \
+                in self._app["commandline"].search.result_set:
+            name = self._markup + "<b>" + name + "</b></span>"
 
         return name
 
-    def reload(self, filename, reload_image=True):
+    def _update_names(self, paths=None):
+        """Rename paths whose mark or search state changed.
+
+        The names are created again once the thumbnails are drawn.
+
+        Args:
+            paths: Paths to rename. Defaults to all paths.
+        """
+        if paths is None:
+            self._names.clear()
+            self._highlighted = \
+                set(self._app["commandline"].search.result_set)
+        else:
+            for path in paths:
+                self._names.pop(path, None)
+        self.queue_draw()
+
+    def reload(self, filename, reload_image=True, ignore_cache=False):
         """Reload the thumbnails of manipulated images.
 
         Args:
             filename: Name of the file to reload thumbnail of.
             reload_image: If True reload the image of the thumbnail. Else only
                 the name (useful for marking).
+            ignore_cache: If True recreate the thumbnail even if the file
+                seems unchanged. Needed after transforming the image.
         """
-        index = self._app.get_paths().index(filename)
-        name = self._get_name(filename)
-        if os.path.basename(filename) \
-                in self._app["commandline"].search.results:
-            name = self._markup + "<b>" + name + "</b></span>"
-
-        # pylint: disable=unsubscriptable-object
+        index = self._rows.get(filename)
+        if index is None:
+            return
         if reload_image:
-            self._thumbnail_manager.get_thumbnail_at_scale_async(
-                filename, self.get_zoom_level()[0],
-                self._on_thumbnail_created, index, ignore_cache=True)
-
-        self._liststore[index][1] = name
+            self._scheduler.load(index, filename, ignore_cache=ignore_cache)
+        self._update_names([filename])
 
     def move_direction(self, direction):
         """Scroll with "hjkl".
@@ -238,12 +379,12 @@ class Thumbnail(Gtk.IconView):
         step = self._app["eventhandler"].num_receive()
         # Get variables used for calculation of limits
         last = len(self._app.get_paths())
-        rows = self.get_item_row(Gtk.TreePath(last - 1))
+        rows = self.get_item_row(last - 1)
         columns = self.get_columns()
         elem_last_row = last - rows * columns
         elem_per_row = floor((last - elem_last_row) / rows) if rows else last
-        column = self.get_item_column(Gtk.TreePath(new_pos))
-        row = self.get_item_row(Gtk.TreePath(new_pos))
+        column = self.get_item_column(new_pos)
+        row = self.get_item_row(new_pos)
         min_pos = 0
         max_pos = last - 1
         # Simple scrolls
@@ -280,15 +421,13 @@ class Thumbnail(Gtk.IconView):
         self.move_to_pos(new_pos)
 
     def move_to_pos(self, pos):
-        """Set focus on position in iconview and center it.
+        """Set focus on position in the grid and center it.
 
         Args:
             pos: The position to focus.
         """
-        self.select_path(Gtk.TreePath(pos))
-        cell_renderer = self.get_cells()[0]
-        self.set_cursor(Gtk.TreePath(pos), cell_renderer, False)
-        self.scroll_to_path(Gtk.TreePath(pos), True, 0.5, 0.5)
+        self.set_cursor(pos)
+        self.scroll_to_index(pos)
         # Clear the user prefixed step
         self._app["eventhandler"].num_clear()
 
@@ -305,12 +444,12 @@ class Thumbnail(Gtk.IconView):
             self._zoom_level_index -= 1
         else:
             return
-        # Rescale all images in liststore
-        if self.toggled:
-            self.reload_all()
         # Set columns and refocus current image
         self.calculate_columns()
         self.move_to_pos(self.get_position())
+        # Load all thumbnails at the new size
+        if self.toggled:
+            self.reload_all()
 
     def get_zoom_level(self):
         return self._zoom_levels[self._zoom_level_index]
@@ -318,42 +457,56 @@ class Thumbnail(Gtk.IconView):
     def get_cache_directory(self):
         return self._thumbnail_manager.thumbnail_store.base_dir
 
+    def show_cache_info(self):
+        self._app["statusbar"].message(
+            self._thumbnail_manager.get_cache_info(), "info")
+
+    def collect_garbage(self):
+        """Clean up the thumbnail store on disk in a background thread."""
+        self._app["statusbar"].message("Cleaning up thumbnails...", "info")
+        Thread(target=self._collect_garbage_thread, daemon=True).start()
+
+    def _collect_garbage_thread(self):
+        budget = settings["thumbnail_gc_mb"].get_value() * 1024 * 1024
+        removed, freed = \
+            self._thumbnail_manager.thumbnail_store.collect_garbage(budget)
+        GLib.idle_add(self._app["statusbar"].message,
+                      "Removed %d thumbnails, freed %s"
+                      % (removed, sizeof_fmt(freed)), "info")
+
     def get_position(self):
-        path = self.get_cursor()[1]
-        return path.get_indices()[0] if path else 0
+        return self.get_cursor()
 
     def on_paths_changed(self):
-        """Reload thumbnails properly when paths have changed."""
-        diff = len(self._liststore) - len(self._app.get_paths())
-        # Delete extra elements
-        while diff > 0:
-            # pylint: disable=unsubscriptable-object
-            self._liststore.remove(self._liststore[-1].iter)
-            diff -= 1
-        # Insert dummy elements to override
-        default_pixbuf = self._get_default_pixbuf() if diff < 0 else None
-        while diff < 0:
-            name = self._get_name(self._app.get_paths()[diff])
-            self._liststore.append([default_pixbuf, name])
-            diff += 1
-        for path in self._app.get_paths():
-            self.reload(path)
+        """Update the rows of changed paths when paths have changed.
+
+        Only thumbnails of inserted paths are loaded, the others keep their
+        thumbnail or their place in the order of the scheduler.
+        """
+        inserted = self._update_rows()
+        self._scheduler.update_paths(self._row_paths, inserted)
 
     def _on_marks_changed(self, mark, changed):
         """Reload names if marks changed."""
+        self._marked = None
         if self.toggled:
-            for name in changed:
-                self.reload(name, False)
+            self._update_names(changed)
         self._app["statusbar"].update_info()  # Do this once from here
 
     def _on_transformations_applied_to_file(self, transform, files):
         if self.toggled:
             for name in files:
-                self.reload(name)
+                self.reload(name, ignore_cache=True)
+        else:
+            self._transformed.update(files)
 
     def _on_search_completed(self, search, new_pos, last_focused):
         if self.toggled:
-            for path in self._app.get_paths():
-                self.reload(path, False)
+            # Only rows which were or became a search result change
+            changed = self._highlighted ^ search.result_set
+            self._highlighted = set(search.result_set)
+            self._update_names(
+                path for basename in changed
+                for path in self._basenames.get(basename, []))
         if last_focused == "thu":
             self.move_to_pos(new_pos)
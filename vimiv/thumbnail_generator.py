@@ -0,0 +1,106 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Generate thumbnails of whole directories without opening a window.
+
+Used by the --generate-thumbnails commandline option to fill the thumbnail
+cache ahead of time, e.g. on a shared photo server.
+"""
+
+import collections
+import multiprocessing
+import os
+from time import time
+
+from gi.repository import GdkPixbuf, GLib
+from vimiv.fileactions import recursive_search
+from vimiv.helpers import listdir_wrapper
+from vimiv.settings import settings
+from vimiv.thumbnail_manager import ThumbnailStore
+
+# Thumbnail sizes generated, one store per size and worker process
+_SIZES = [128, 256]
+_stores = []
+
+# Results of a single thumbnail, counted in the summary
+RESULTS = ["created", "current", "skipped", "failed"]
+
+
+def get_files(paths, recursive=False):
+    """Return all files of the given paths.
+
+    Args:
+        paths: List of files and directories.
+        recursive: If True search directories recursively.
+    Return:
+        List of absolute paths of the files.
+    """
+    files = []
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.isfile(path):
+            files.append(path)
+        elif recursive:
+            files.extend(sorted(recursive_search(path)))
+        elif os.path.isdir(path):
+            files.extend(os.path.join(path, fil)
+                         for fil in listdir_wrapper(path))
+    return [fil for fil in files if os.path.isfile(fil)]
+
+
+def generate_thumbnails(paths, recursive=False, jobs=None):
+    """Generate normal and large thumbnails of all images in paths.
+
+    Thumbnails which are current and images for which thumbnail creation
+    failed before are skipped.
+
+    Args:
+        paths: List of files and directories.
+        recursive: If True search directories recursively.
+        jobs: Number of processes generating thumbnails. Defaults to the
+            number of processors.
+    Return:
+        Tuple of a dictionary of the number of thumbnails for each result in
+        RESULTS, the number of images and the elapsed time in seconds.
+    """
+    start = time()
+    files = get_files(paths, recursive)
+    counts = collections.OrderedDict((result, 0) for result in RESULTS)
+    images = 0
+    # Processes are started fresh as forking a process with threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(jobs, initializer=_init_process,
+                        initargs=(settings["thumbnail_index"].get_value(),))
+    with pool:
+        for results in pool.imap_unordered(_generate, files, chunksize=8):
+            if results:
+                images += 1
+            for result in results:
+                counts[result] += 1
+    return counts, images, max(time() - start, 1e-6)
+
+
+def _init_process(use_index):
+    """Create the stores of a worker process.
+
+    Worker processes do not read the configuration, so the value of the
+    thumbnail_index setting is passed instead.
+    """
+    for size in _SIZES:
+        store = ThumbnailStore(size=size)
+        store.use_index = use_index
+        _stores.append(store)
+
+
+def _generate(filename):
+    """Create the thumbnails of a single file in a worker process.
+
+    Return:
+        List of results for each thumbnail size, empty if filename is not an
+        image.
+    """
+    try:
+        if not GdkPixbuf.Pixbuf.get_file_info(filename)[0]:
+            return []
+        return [store.ensure_thumbnail(filename) for store in _stores]
+    except (OSError, GLib.Error):
+        # The file was removed while generating or is corrupt
+        return ["failed"] * len(_stores)
@@ -0,0 +1,266 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Grid widget which only lays out and draws the visible thumbnails."""
+
+from gi.repository import Gdk, GObject, Gtk, Pango
+
+
+class ThumbnailGrid(Gtk.DrawingArea):
+    """Grid of equally sized items with a pixbuf above a markup name.
+
+    As all items have the same size, the position of every item follows from
+    its index and the number of columns. Nothing is stored per item, only the
+    items in the exposed region are requested from get_item when drawing. The
+    grid is added to a Gtk.ScrolledWindow like the image and requests the size
+    of all items so it is scrolled by the viewport.
+
+    Attributes:
+        _columns: Number of columns.
+        _column_spacing: Space between two columns in px.
+        _count: Number of items.
+        _cursor: Index of the focused item.
+        _get_item: Function returning the pixbuf and the markup name of the
+            item at an index.
+        _item_padding: Padding around the pixbuf of an item in px.
+        _item_size: Size of the pixbuf of an item in px.
+        _scroll_to: Index to center once the grid was allocated, None if no
+            scroll is pending.
+        _text_height: Height of the names in px.
+    """
+
+    # Space around all items in px
+    MARGIN = 6
+    # Space between two rows in px
+    ROW_SPACING = 6
+    # Maximum number of lines of a name
+    TEXT_LINES = 2
+
+    def __init__(self, get_item):
+        """Create an empty grid.
+
+        Args:
+            get_item: Function returning the pixbuf and the markup name of the
+                item at an index.
+        """
+        super(ThumbnailGrid, self).__init__()
+        self._get_item = get_item
+        self._columns = 1
+        self._column_spacing = 0
+        self._count = 0
+        self._cursor = 0
+        self._item_padding = 0
+        self._item_size = 128
+        self._scroll_to = None
+        self._text_height = 0
+        self.set_can_focus(True)
+        self.add_events(Gdk.EventMask.BUTTON_PRESS_MASK
+                        | Gdk.EventMask.BUTTON_RELEASE_MASK
+                        | Gdk.EventMask.KEY_PRESS_MASK)
+        self.get_style_context().add_class(Gtk.STYLE_CLASS_VIEW)
+        self.connect("size-allocate", self._on_size_allocate)
+
+    def set_item_count(self, count):
+        self._count = count
+        self._cursor = min(self._cursor, max(0, count - 1))
+        self._update_size()
+
+    def get_item_count(self):
+        return self._count
+
+    def set_item_size(self, size):
+        self._item_size = size
+        self._update_size()
+
+    def set_item_padding(self, padding):
+        self._item_padding = padding
+        self._update_size()
+
+    def get_item_padding(self):
+        return self._item_padding
+
+    def set_column_spacing(self, spacing):
+        self._column_spacing = spacing
+        self._update_size()
+
+    def set_columns(self, columns):
+        self._columns = max(1, columns)
+        self._update_size()
+
+    def get_columns(self):
+        return self._columns
+
+    def get_item_row(self, index):
+        return index // self._columns
+
+    def get_item_column(self, index):
+        return index % self._columns
+
+    def get_cursor(self):
+        return self._cursor
+
+    def set_cursor(self, index):
+        """Focus the item at index and redraw the previous and new item."""
+        for redraw in [self._cursor, index]:
+            self.queue_draw_area(*self._get_item_area(redraw))
+        self._cursor = index
+
+    def scroll_to_index(self, index):
+        """Center the item at index in the visible region.
+
+        If the viewport did not update to the size of the grid yet,
+        scrolling happens once the grid was allocated.
+        """
+        self._scroll_to = index
+        adjustment = self._get_vadjustment()
+        if adjustment is not None and adjustment.get_upper() == max(
+                self.get_size_request()[1], adjustment.get_page_size()):
+            self._apply_scroll()
+
+    def get_visible_range(self):
+        """Return the first and last visible index.
+
+        Return:
+            Tuple of both indices, None if nothing is visible.
+        """
+        adjustment = self._get_vadjustment()
+        if not self._count or adjustment is None \
+                or not adjustment.get_page_size():
+            return None
+        top = adjustment.get_value()
+        bottom = top + adjustment.get_page_size()
+        first = self._get_row_at(top) * self._columns
+        last = (self._get_row_at(bottom) + 1) * self._columns - 1
+        return min(first, self._count - 1), min(last, self._count - 1)
+
+    def get_index_at(self, x, y):
+        """Return the index of the item at x, y or None if there is none."""
+        item_width, item_height = self._get_item_size()
+        x -= self.MARGIN
+        y -= self.MARGIN
+        column_width = item_width + self._column_spacing
+        row_height = item_height + self.ROW_SPACING
+        if x < 0 or y < 0 or x % column_width >= item_width \
+                or y % row_height >= item_height:
+            return None
+        column = int(x // column_width)
+        index = int(y // row_height) * self._columns + column
+        if column >= self._columns or index >= self._count:
+            return None
+        return index
+
+    def do_draw(self, cr):
+        """Draw the items in the exposed region."""
+        context = self.get_style_context()
+        x_1, y_1, x_2, y_2 = cr.clip_extents()
+        Gtk.render_background(context, cr, x_1, y_1, x_2 - x_1, y_2 - y_1)
+        if not self._count:
+            return False
+        layout = self.create_pango_layout("")
+        layout.set_alignment(Pango.Alignment.CENTER)
+        layout.set_wrap(Pango.WrapMode.WORD_CHAR)
+        layout.set_ellipsize(Pango.EllipsizeMode.END)
+        layout.set_width(self._get_item_size()[0] * Pango.SCALE)
+        layout.set_height(-self.TEXT_LINES)
+        first = self._get_row_at(y_1) * self._columns
+        last = min((self._get_row_at(y_2) + 1) * self._columns, self._count)
+        for index in range(first, last):
+            self._draw_item(cr, context, layout, index)
+        return False
+
+    def do_button_press_event(self, event):
+        """Focus clicked items and activate them on double click."""
+        index = self.get_index_at(event.x, event.y)
+        if index is None:
+            return False
+        self.grab_focus()
+        if event.type == Gdk.EventType._2BUTTON_PRESS:
+            self.emit("item-activated", index)
+        else:
+            self.set_cursor(index)
+        return True
+
+    def do_key_press_event(self, event):
+        """Activate the focused item with Return."""
+        if self._count and event.keyval in [Gdk.KEY_Return, Gdk.KEY_KP_Enter]:
+            self.emit("item-activated", self._cursor)
+            return True
+        return False
+
+    def _draw_item(self, cr, context, layout, index):
+        pixbuf, name = self._get_item(index)
+        x, y, width, height = self._get_item_area(index)
+        context.save()
+        if index == self._cursor:
+            context.set_state(Gtk.StateFlags.SELECTED)
+            Gtk.render_background(context, cr, x, y, width, height)
+        # Center the pixbuf in its area, larger ones of the last zoom level
+        # are scaled down
+        scale = min(1, self._item_size / max(pixbuf.get_width(),
+                                             pixbuf.get_height()))
+        pixbuf_width = pixbuf.get_width() * scale
+        pixbuf_height = pixbuf.get_height() * scale
+        cr.save()
+        cr.translate(x + (width - pixbuf_width) // 2,
+                     y + self._item_padding
+                     + (self._item_size - pixbuf_height) // 2)
+        cr.scale(scale, scale)
+        Gdk.cairo_set_source_pixbuf(cr, pixbuf, 0, 0)
+        cr.paint()
+        cr.restore()
+        layout.set_markup(name, -1)
+        Gtk.render_layout(context, cr, x,
+                          y + self._item_size + 2 * self._item_padding,
+                          layout)
+        context.restore()
+
+    def _get_item_size(self):
+        """Return width and height of an item including its name."""
+        size = self._item_size + 2 * self._item_padding
+        return size, size + self._text_height
+
+    def _get_item_area(self, index):
+        """Return x, y, width and height of the item at index."""
+        item_width, item_height = self._get_item_size()
+        x = self.MARGIN + self.get_item_column(index) \
+            * (item_width + self._column_spacing)
+        y = self.MARGIN + self.get_item_row(index) \
+            * (item_height + self.ROW_SPACING)
+        return x, y, item_width, item_height
+
+    def _get_row_at(self, y):
+        row_height = self._get_item_size()[1] + self.ROW_SPACING
+        return max(0, int((y - self.MARGIN) // row_height))
+
+    def _get_vadjustment(self):
+        parent = self.get_parent()
+        if isinstance(parent, Gtk.Scrollable):
+            return parent.get_vadjustment()
+        return None
+
+    def _update_size(self):
+        """Request the size of all items and redraw."""
+        line_height = self.create_pango_layout("X").get_pixel_size()[1]
+        self._text_height = self.TEXT_LINES * line_height
+        item_width, item_height = self._get_item_size()
+        rows = -(-self._count // self._columns)
+        width = 2 * self.MARGIN + self._columns * item_width \
+            + (self._columns - 1) * self._column_spacing
+        height = 2 * self.MARGIN + rows * item_height \
+            + max(0, rows - 1) * self.ROW_SPACING
+        self.set_size_request(width, height)
+        self.queue_draw()
+
+    def _apply_scroll(self):
+        adjustment = self._get_vadjustment()
+        if adjustment is None:
+            return
+        y, height = self._get_item_area(self._scroll_to)[1::2]
+        self._scroll_to = None
+        adjustment.set_value(y + (height - adjustment.get_page_size()) / 2)
+
+    def _on_size_allocate(self, widget, allocation):
+        if self._scroll_to is not None:
+            self._apply_scroll()
+
+
+GObject.signal_new("item-activated", ThumbnailGrid, GObject.SIGNAL_RUN_LAST,
+                   None, (GObject.TYPE_INT,))
@@ -0,0 +1,123 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Persistent index of the thumbnails in the thumbnail store."""
+
+import os
+import sqlite3
+from threading import Lock
+
+
+class ThumbnailIndex(object):
+    """Index of thumbnails stored in a sqlite database.
+
+    For every thumbnail vimiv created or validated the modification time and
+    size of the source file are stored together with whether creating the
+    thumbnail failed. Thumbnails of a whole directory can then be validated
+    with a single query and a scan of the directory instead of reading the
+    metadata of every thumbnail. The index is only a cache, errors of the
+    database are ignored. If the database cannot be opened, the index stays
+    empty.
+
+    Attributes:
+        _connection: sqlite3.Connection to the database, None if opening it
+            failed.
+        _lock: Lock as the index is used from the thumbnail threads.
+    """
+
+    def __init__(self, path):
+        """Open the database creating it if necessary.
+
+        Args:
+            path: Path of the database file.
+        """
+        self._connection = None
+        self._lock = Lock()
+        try:
+            os.makedirs(os.path.dirname(path), 0o700, exist_ok=True)
+            connection = sqlite3.connect(path, timeout=10,
+                                         check_same_thread=False)
+        except (OSError, sqlite3.Error):
+            return
+        try:
+            with connection:
+                # Allow reading while other processes create thumbnails
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS thumbnails ("
+                    "name TEXT, size INTEGER, directory TEXT, mtime INTEGER, "
+                    "source_size INTEGER, failed INTEGER, "
+                    "PRIMARY KEY (name, size))")
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS thumbnails_directory "
+                    "ON thumbnails (directory, size)")
+        except sqlite3.Error:
+            connection.close()
+            return
+        self._connection = connection
+
+    def add(self, name, size, source, mtime, source_size, failed=False):
+        """Add or update the entry of a thumbnail.
+
+        Args:
+            name: Filename of the thumbnail.
+            size: Size of the thumbnail.
+            source: Absolute path of the source file.
+            mtime: Modification time of the source file in seconds.
+            source_size: Size of the source file in bytes.
+            failed: True if creating the thumbnail failed.
+        """
+        if self._connection is None:
+            return
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO thumbnails "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, size, os.path.dirname(source), mtime, source_size,
+                     int(failed)))
+        except sqlite3.Error:
+            pass
+
+    def get_directory(self, directory, size):
+        """Return the entries of all thumbnails of sources in directory.
+
+        Args:
+            directory: Absolute path of the directory of the sources.
+            size: Size of the thumbnails.
+        Return:
+            Dictionary of entries.
+            Key: Filename of the thumbnail; Item: Tuple of modification time,
+            size of the source and whether creating the thumbnail failed.
+        """
+        if self._connection is None:
+            return {}
+        try:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT name, mtime, source_size, failed FROM thumbnails "
+                    "WHERE directory = ? AND size = ?",
+                    (directory, size)).fetchall()
+        except sqlite3.Error:
+            return {}
+        return {name: (mtime, source_size, bool(failed))
+                for name, mtime, source_size, failed in rows}
+
+    def remove(self, entries):
+        """Remove the entries of deleted thumbnails.
+
+        Args:
+            entries: List of tuples of filename and size of the thumbnails.
+        """
+        if self._connection is None:
+            return
+        try:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    "DELETE FROM thumbnails WHERE name = ? AND size = ?",
+                    entries)
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
@@ -12,22 +12,124 @@ instead.
 
 import collections
 import hashlib
+import multiprocessing
 import os
+import shutil
+import struct
 import tempfile
-from multiprocessing.pool import ThreadPool as Pool
+import zlib
+from threading import Lock
+from time import time
+from urllib.parse import unquote, urlsplit
 
 from gi._error import GError
 from gi.repository import GdkPixbuf, GLib, Gtk
 from gi.repository.GdkPixbuf import Pixbuf
 
+from vimiv.decode_scheduler import DecodeScheduler
 from vimiv.helpers import get_user_cache_dir
+from vimiv.imageactions import get_exif_preview
+from vimiv.pixbuf_cache import PixbufCache, get_file_key
+from vimiv.settings import settings
+from vimiv.thumbnail_index import ThumbnailIndex
 
 ThumbTuple = collections.namedtuple('ThumbTuple', ['original', 'thumbnail'])
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def read_png_text(filename):
+    """Read the textual metadata of a png file without decoding the image.
+
+    The chunks are read until the first image data chunk, which is never
+    inflated. tEXt, zTXt and iTXt chunks are supported.
+
+    Args:
+        filename: Name of the png file to read.
+    Return:
+        Dictionary of keyword and text of all textual chunks. Empty if the file
+        is not a valid png.
+    """
+    text = {}
+    with open(filename, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return text
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type in [b"IDAT", b"IEND"]:
+                break
+            if chunk_type not in [b"tEXt", b"zTXt", b"iTXt"]:
+                f.seek(length + 4, os.SEEK_CUR)  # Skip data and crc
+                continue
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)
+            try:
+                keyword, value = _parse_text_chunk(chunk_type, data)
+            except (IndexError, ValueError, zlib.error):
+                continue  # Ignore corrupt chunks
+            text[keyword] = value
+    return text
+
+
+def _parse_text_chunk(chunk_type, data):
+    """Return keyword and text of a textual png chunk."""
+    keyword, value = data.split(b"\0", 1)
+    keyword = keyword.decode("latin-1")
+    if chunk_type == b"tEXt":
+        return keyword, value.decode("latin-1")
+    if chunk_type == b"zTXt":
+        return keyword, zlib.decompress(value[1:]).decode("latin-1")
+    # iTXt: compression flag, method, language tag and translated keyword
+    compressed = value[0]
+    _, _, value = value[2:].split(b"\0", 2)
+    if compressed:
+        value = zlib.decompress(value)
+    return keyword, value.decode("utf-8")
+
+
+# ThumbnailStores of a worker process of the process pool, one per size
+_process_stores = {}
+
+
+def _create_thumbnail_in_process(source_file, size, ignore_current,
+                                 use_index):
+    """Create a thumbnail in a worker process of the process pool.
+
+    Worker processes do not read the configuration, so the settings the store
+    depends on are passed with every thumbnail.
+
+    Args:
+        source_file: Path of the image to create the thumbnail of.
+        size: Size of the thumbnail.
+        ignore_current: If True create the thumbnail even if it is current.
+        use_index: Value of the thumbnail_index setting.
+    Return:
+        The path of the thumbnail file or None if thumbnail creation failed.
+    """
+    if size not in _process_stores:
+        _process_stores[size] = ThumbnailStore(size=size)
+    store = _process_stores[size]
+    store.use_index = use_index
+    return store.get_thumbnail(source_file, ignore_current)
+
 
 class ThumbnailManager:
     """Provides an asynchronous mechanism to load thumbnails.
 
+    Missing thumbnails are created in a pool of processes instead of the
+    thread pool if the thumbnail_processes setting is enabled. The processes
+    store the thumbnails in the ThumbnailStore and only their path is returned.
+
+    Thumbnails are loaded from the smallest size of the standard which is at
+    least as large as the requested size so they are never upscaled.
+
+    Loaded thumbnails are collected and passed to their callbacks in batches
+    at most once every BATCH_INTERVAL milliseconds so the main loop is not
+    flooded when many thumbnails finish at the same time.
+
     Attributes:
         thumbnail_store: ThumbnailStore class with the loading mechanism.
         large: The thumbnail managing standard specifies two thumbnail sizes.
@@ -35,16 +137,29 @@ class ThumbnailManager:
         default_icon: Default icon if thumbnails are not yet loaded.
         error_icon: The path to the icon which is used, when thumbnail creation
                     fails.
+
+        _results: List of tuples of callback, pixbuf and index of loaded
+            thumbnails which were not passed to their callback yet.
+        _results_lock: Lock as results are added from the worker threads.
+        _stores: Dictionary of ThumbnailStores for the different sizes.
+            Key: Size of the thumbnails; Item: ThumbnailStore.
+        _stores_lock: Lock as stores are created from the worker threads.
     """
 
+    # Minimum time between two batches of loaded thumbnails in ms
+    BATCH_INTERVAL = 16
+
     _cpu_count = os.cpu_count()
     if _cpu_count is None:
         _cpu_count = 1
     elif _cpu_count > 1:
         _cpu_count -= 1
 
-    _thread_pool = Pool(_cpu_count)
-    _cache = {}
+    _scheduler = DecodeScheduler(_cpu_count)
+    _process_pool = None
+    _process_pool_lock = Lock()
+    _cache = PixbufCache("thumbnail_cache_mb", "thumbnail_cache_entries",
+                         "Thumbnail cache")
 
     def __init__(self, large=True):
         """Construct a new ThumbnailManager.
@@ -55,6 +170,10 @@ class ThumbnailManager:
         """
         super(ThumbnailManager, self).__init__()
         self.thumbnail_store = ThumbnailStore(large=large)
+        self._stores = {self.thumbnail_store.thumb_size: self.thumbnail_store}
+        self._stores_lock = Lock()
+        self._results = []
+        self._results_lock = Lock()
 
         # Default icon if thumbnail creation fails
         icon_theme = Gtk.IconTheme.get_default()
@@ -65,21 +184,64 @@ class ThumbnailManager:
 
     def _do_get_thumbnail_at_scale(self, source_file, size, callback, index,
                                    ignore_cache=False):
-        if not ignore_cache and source_file in self._cache:
-            pixbuf = self._cache[source_file]
-        else:
-            thumbnail_path = self.thumbnail_store.get_thumbnail(source_file,
-                                                                ignore_cache)
+        pixbuf = None if ignore_cache else self._cache.get(source_file)
+        # Thumbnails cached at a smaller size would have to be upscaled
+        if pixbuf is not None \
+                and max(pixbuf.get_width(), pixbuf.get_height()) < size:
+            pixbuf = None
+        if pixbuf is None:
+            # Retrieved first so changes of the source invalidate the entry
+            try:
+                key = get_file_key(source_file)
+            except OSError:
+                key = None
+            thumbnail_path = self._get_thumbnail_path(source_file, size,
+                                                      ignore_cache)
             if thumbnail_path is None:
                 thumbnail_path = self.error_icon
             pixbuf = Pixbuf.new_from_file(thumbnail_path)
-            self._cache[source_file] = pixbuf
+            self._cache.add(source_file, key, pixbuf)
 
         if pixbuf.get_height() != size and pixbuf.get_width != size:
             pixbuf = self.scale_pixbuf(pixbuf, size)
 
         return callback, pixbuf, index
 
+    def get_cache_info(self):
+        return self._cache.get_info()
+
+    def _get_thumbnail_path(self, source_file, size, ignore_cache):
+        """Return the path of the thumbnail creating it if necessary."""
+        store = self._get_store(size)
+        if not settings["thumbnail_processes"].get_value():
+            return store.get_thumbnail(source_file, ignore_cache)
+        thumbnail_path = store.get_thumbnail(source_file, ignore_cache,
+                                             create=False)
+        if thumbnail_path is None:
+            thumbnail_path = self._get_process_pool().apply(
+                _create_thumbnail_in_process,
+                (source_file, store.thumb_size, ignore_cache,
+                 settings["thumbnail_index"].get_value()))
+        return thumbnail_path
+
+    def _get_store(self, size):
+        """Return the ThumbnailStore of the smallest size fitting size."""
+        _, thumb_size = ThumbnailStore.get_tier(size)
+        with self._stores_lock:
+            if thumb_size not in self._stores:
+                self._stores[thumb_size] = ThumbnailStore(size=thumb_size)
+            return self._stores[thumb_size]
+
+    @classmethod
+    def _get_process_pool(cls):
+        """Return the process pool creating it on first use."""
+        with cls._process_pool_lock:
+            if cls._process_pool is None:
+                # Forking a process running Gtk and threads is unsafe
+                context = multiprocessing.get_context("spawn")
+                cls._process_pool = context.Pool(cls._cpu_count)
+        return cls._process_pool
+
     @staticmethod
     def scale_pixbuf(pixbuf, size):
         """Scale the pixbuf to the given size keeping the aspect ratio.
@@ -106,12 +268,32 @@ class ThumbnailManager:
                                      GdkPixbuf.InterpType.BILINEAR)
         return pixbuf
 
-    @staticmethod
-    def _do_callback(result):
-        GLib.idle_add(*result)
+    def _do_get_thumbnail_job(self, job, filename, size, callback, index,
+                              ignore_cache, skip_current):
+        if skip_current and self._cache.is_current(filename):
+            result = callback, None, index
+        else:
+            result = self._do_get_thumbnail_at_scale(filename, size, callback,
+                                                     index, ignore_cache)
+        if not job.cancelled:
+            with self._results_lock:
+                self._results.append(result)
+                # The first result of a batch schedules its delivery
+                if len(self._results) == 1:
+                    GLib.timeout_add(self.BATCH_INTERVAL,
+                                     self._deliver_results)
+
+    def _deliver_results(self):
+        """Pass a batch of loaded thumbnails to their callbacks."""
+        with self._results_lock:
+            results, self._results = self._results, []
+        for callback, pixbuf, index in results:
+            callback(pixbuf, index)
+        return False
 
     def get_thumbnail_at_scale_async(self, filename, size, callback, index,
-                                     ignore_cache=False):
+                                     ignore_cache=False, priority=0,
+                                     skip_current=False):
         """Create the thumbnail for 'filename' and return it via 'callback'.
 
         Creates the thumbnail for the given filename at the given size and
@@ -124,15 +306,52 @@ class ThumbnailManager:
             args: Any additional arguments that can be passed to callback
             ignore_cache: If true, the builtin in-memory cache is bypassed and
                           the thumbnail file is loaded from disk
+            priority: Priority of the job, lower values are loaded first.
+            skip_current: If True and the cached thumbnail is current, call
+                          callback with None instead of the pixbuf.
+
+        Return:
+            The DecodeJob which can be used to cancel loading.
         """
-        self._thread_pool.apply_async(self._do_get_thumbnail_at_scale,
-                                      (filename, size, callback, index,
-                                       ignore_cache),
-                                      callback=self._do_callback)
+        return self._scheduler.submit(self._do_get_thumbnail_job, filename,
+                                      size, callback, index, ignore_cache,
+                                      skip_current, priority=priority)
 
 
 class ThumbnailStore(object):
-    """Implements freedesktop.org's Thumbnail Managing Standard."""
+    """Implements freedesktop.org's Thumbnail Managing Standard.
+
+    If the thumbnail_index setting is enabled, thumbnails are additionally
+    recorded in a ThumbnailIndex. The entries of a directory are then read
+    with one query of the index and reused for VALIDATION_TIMEOUT seconds.
+    Every thumbnail is still compared with a fresh stat of its source.
+
+    Attributes:
+        use_index: If True or False, override the thumbnail_index setting.
+            Used where the configuration is not read. None to follow the
+            setting.
+
+        _index: ThumbnailIndex once it was opened.
+        _lock: Lock as the store is used from the thumbnail threads.
+        _validated: Dictionary of the index entries of recent directories.
+            Key: Directory; Item: Tuple of the time of the query and the
+            entries returned by ThumbnailIndex.get_directory.
+    """
+
+    # Time in seconds the index entries of a directory are reused
+    VALIDATION_TIMEOUT = 10
+    # Maximum number of directories whose index entries are kept
+    MAX_DIRECTORIES = 64
+
+    # Directories and sizes of thumbnails defined by the standard
+    TIERS = [("normal", 128), ("large", 256), ("x-large", 512),
+             ("xx-large", 1024)]
+
+    # Formats whose embedded exif preview is used to create thumbnails
+    PREVIEW_FORMATS = ["jpeg"]
+    # Maximum relative difference of the aspect ratios of preview and image,
+    # previews with black bars are not used
+    PREVIEW_ASPECT_TOLERANCE = 0.02
 
     KEY_URI = "Thumb::URI"
     KEY_MTIME = "Thumb::MTime"
@@ -140,12 +359,13 @@ class ThumbnailStore(object):
     KEY_WIDTH = "Thumb::Image::Width"
     KEY_HEIGHT = "Thumb::Image::Height"
 
-    def __init__(self, large=True):
+    def __init__(self, large=True, size=None):
         """Construct a new ThumbnailStore.
 
         Args:
             large: Size of thumbnails that are created. If true 256x256 else
                    128x128.
+            size: Create thumbnails of the smallest size fitting size instead.
         """
         super(ThumbnailStore, self).__init__()
         import vimiv
@@ -154,7 +374,14 @@ class ThumbnailStore(object):
             self.base_dir, "fail", "vimiv-" + vimiv.__version__)
         self.thumbnail_dir = ""
         self.thumb_size = 0
-        self.use_large_thumbnails(large)
+        self.use_index = None
+        self._index = None
+        self._lock = Lock()
+        self._validated = {}
+        if size is None:
+            self.use_large_thumbnails(large)
+        else:
+            self.use_size(size)
         self._ensure_dirs_exist()
 
     def use_large_thumbnails(self, enabled=True):
@@ -165,14 +392,29 @@ class ThumbnailStore(object):
         Args:
             enabled: If true large thumbnails will be used.
         """
-        if enabled:
-            self.thumbnail_dir = os.path.join(self.base_dir, "large")
-            self.thumb_size = 256
-        else:
-            self.thumbnail_dir = os.path.join(self.base_dir, "normal")
-            self.thumb_size = 128
+        self.use_size(256 if enabled else 128)
+
+    def use_size(self, size):
+        """Use the smallest thumbnail size which is at least size.
+
+        Args:
+            size: Minimum size of the thumbnails.
+        """
+        directory, self.thumb_size = self.get_tier(size)
+        self.thumbnail_dir = os.path.join(self.base_dir, directory)
 
-    def get_thumbnail(self, filename, ignore_current=False):
+    @classmethod
+    def get_tier(cls, size):
+        """Return directory and size of the smallest tier fitting size.
+
+        Sizes beyond the largest tier return the largest one.
+        """
+        for directory, thumb_size in cls.TIERS:
+            if thumb_size >= size:
+                return directory, thumb_size
+        return cls.TIERS[-1]
+
+    def get_thumbnail(self, filename, ignore_current=False, create=True):
         """Get the path of the thumbnail of the given filename.
 
         If the requested thumbnail does not yet exist, it will first be created
@@ -183,6 +425,7 @@ class ThumbnailStore(object):
             ignore_current: If True, ignore saved thumbnails and force a
                 recreation. Needed as transforming images from within thumbnail
                 mode may happen faster than in 1s.
+            create: If False, return None instead of creating the thumbnail.
 
         Return:
             The path of the thumbnail file or None if thumbnail creation failed.
@@ -193,13 +436,11 @@ class ThumbnailStore(object):
 
         thumbnail_filename = self._get_thumbnail_filename(filename)
         thumbnail_path = self._get_thumbnail_path(thumbnail_filename)
-        if os.access(thumbnail_path, os.R_OK) \
-                and self._is_current(filename, thumbnail_path) \
-                and not ignore_current:
+        state = self._get_state(filename, thumbnail_filename, ignore_current)
+        if state == "current":
             return thumbnail_path
 
-        fail_path = self._get_fail_path(thumbnail_filename)
-        if os.path.exists(fail_path):
+        if not create or state == "failed":
             # We already tried to create a thumbnail for the given file but
             # failed; don't try again.
             return None
@@ -209,6 +450,226 @@ class ThumbnailStore(object):
 
         return None
 
+    def ensure_thumbnail(self, filename):
+        """Create the thumbnail of filename if it is missing or outdated.
+
+        Args:
+            filename: The filename to create the thumbnail for.
+
+        Return:
+            "current" if the thumbnail was up to date, "created" if it was
+            created, "skipped" if creating it failed before and "failed" if it
+            failed now.
+        """
+        thumbnail_filename = self._get_thumbnail_filename(filename)
+        state = self._get_state(filename, thumbnail_filename, False)
+        if state == "current":
+            return "current"
+        if state == "failed":
+            return "skipped"
+        if self._create_thumbnail(filename, thumbnail_filename):
+            return "created"
+        return "failed"
+
+    def get_existing_thumbnail(self, filename):
+        """Get the path of a current thumbnail without creating it.
+
+        Thumbnails of all sizes are checked, the largest one first.
+
+        Args:
+            filename: The filename to get the thumbnail for.
+
+        Return:
+            The path of the thumbnail file or None if there is none.
+        """
+        thumbnail_filename = self._get_thumbnail_filename(filename)
+        for directory, _ in reversed(self.TIERS):
+            thumbnail_path = os.path.join(self.base_dir, directory,
+                                          thumbnail_filename)
+            if os.access(thumbnail_path, os.R_OK) \
+                    and self._is_current(filename, thumbnail_path):
+                return thumbnail_path
+        return None
+
+    def collect_garbage(self, budget):
+        """Remove outdated thumbnails and trim the store to budget.
+
+        Thumbnails and fail files whose source no longer exists or changed are
+        removed as well as fail directories of other vimiv versions. Then the
+        least recently used thumbnails are removed until all of them fit into
+        budget.
+
+        Args:
+            budget: Maximum size of all thumbnails in bytes.
+        Return:
+            Tuple of the number of removed thumbnails and the freed bytes.
+        """
+        removed, freed = 0, 0
+        fail_base = os.path.dirname(self.fail_dir)
+        for directory in os.listdir(fail_base):
+            path = os.path.join(fail_base, directory)
+            if directory.startswith("vimiv-") and path != self.fail_dir:
+                for entry in os.scandir(path):
+                    removed += 1
+                    freed += entry.stat().st_size
+                shutil.rmtree(path, ignore_errors=True)
+        kept = []
+        outdated = []
+        directories = [(os.path.join(self.base_dir, directory), size)
+                       for directory, size in self.TIERS]
+        directories.append((self.fail_dir, None))
+        for directory, size in directories:
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if not entry.name.endswith(".png"):
+                    continue
+                try:
+                    stat = entry.stat()
+                    is_outdated = self._is_outdated(entry.path)
+                except OSError:  # Removed by another process
+                    continue
+                if is_outdated:
+                    outdated.append((entry, size, stat))
+                elif size is not None:
+                    kept.append((entry, size, stat))
+        # Least recently used first
+        kept.sort(key=lambda item: max(item[2].st_atime, item[2].st_mtime))
+        total = sum(stat.st_size for _, _, stat in kept)
+        while kept and total > budget:
+            entry, size, stat = kept.pop(0)
+            outdated.append((entry, size, stat))
+            total -= stat.st_size
+        for entry, _, stat in outdated:
+            try:
+                os.remove(entry.path)
+                removed += 1
+                freed += stat.st_size
+            except OSError:
+                pass
+        index = self._get_index()
+        if index is not None:
+            index.remove([(entry.name, size) for entry, size, _ in outdated
+                          if size is not None])
+        return removed, freed
+
+    def _is_outdated(self, thumbnail_path):
+        """Return True if the source of the thumbnail is gone or changed.
+
+        Thumbnails which are corrupt or whose URI cannot be parsed as a local
+        file are kept.
+        """
+        try:
+            text = read_png_text(thumbnail_path)
+        except (ValueError, struct.error, zlib.error):
+            return False
+        try:
+            uri = urlsplit(text.get(self.KEY_URI, ""), allow_fragments=False)
+        except ValueError:
+            return False
+        if uri.scheme != "file" or uri.netloc not in ["", "localhost"]:
+            return False
+        # vimiv itself stores unescaped paths which may contain "?" or "%"
+        path = uri.path + "?" + uri.query if uri.query else uri.path
+        mtimes = []
+        for source in {unquote(path), path}:
+            try:
+                mtimes.append(str(self._get_source_mtime(source)))
+            except ValueError:  # Embedded null byte
+                return False
+            except OSError:
+                pass
+        return text.get(self.KEY_MTIME) not in mtimes
+
+    def _get_state(self, filename, thumbnail_filename, ignore_current):
+        """Return the state of the thumbnail of filename.
+
+        Return:
+            "current" if the thumbnail is up to date, "failed" if creating it
+            failed before and None otherwise.
+        """
+        thumbnail_path = self._get_thumbnail_path(thumbnail_filename)
+        if not ignore_current:
+            state = self._get_indexed_state(filename)
+            if state == "failed" \
+                    or state == "current" and os.path.isfile(thumbnail_path):
+                return state
+            if os.access(thumbnail_path, os.R_OK) \
+                    and self._is_current(filename, thumbnail_path):
+                self._add_to_index(filename, thumbnail_filename)
+                return "current"
+        if os.path.exists(self._get_fail_path(thumbnail_filename)):
+            self._add_to_index(filename, thumbnail_filename, failed=True)
+            return "failed"
+        return None
+
+    def _get_index(self):
+        """Return the ThumbnailIndex or None if it is disabled."""
+        use_index = settings["thumbnail_index"].get_value() \
+            if self.use_index is None else self.use_index
+        if not use_index:
+            return None
+        with self._lock:
+            if self._index is None:
+                self._index = ThumbnailIndex(os.path.join(
+                    get_user_cache_dir(), "vimiv", "thumbnails.sqlite"))
+        return self._index
+
+    def _get_indexed_state(self, filename):
+        """Return the state of the thumbnail of filename from the index.
+
+        The entries of the whole directory of filename are read at once and
+        compared with the current modification time and size of filename.
+
+        Return:
+            "current", "failed" or None if the thumbnail is not indexed.
+        """
+        index = self._get_index()
+        if index is None:
+            return None
+        filename = os.path.abspath(filename)
+        directory = os.path.dirname(filename)
+        with self._lock:
+            validated = self._validated.get(directory)
+            if validated is None \
+                    or time() - validated[0] > self.VALIDATION_TIMEOUT:
+                self._prune_validated()
+                validated = (time(), index.get_directory(directory,
+                                                         self.thumb_size))
+                self._validated[directory] = validated
+        entry = validated[1].get(self._get_thumbnail_filename(filename))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        if entry[:2] != (int(stat.st_mtime), stat.st_size):
+            return None
+        return "failed" if entry[2] else "current"
+
+    def _prune_validated(self):
+        """Remove expired directories and keep at most MAX_DIRECTORIES."""
+        now = time()
+        for directory, validated in list(self._validated.items()):
+            if now - validated[0] > self.VALIDATION_TIMEOUT:
+                del self._validated[directory]
+        while len(self._validated) >= self.MAX_DIRECTORIES:
+            del self._validated[min(self._validated,
+                                    key=lambda d: self._validated[d][0])]
+
+    def _add_to_index(self, filename, thumbnail_filename, failed=False):
+        index = self._get_index()
+        if index is None:
+            return
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return
+        index.add(thumbnail_filename, self.thumb_size,
+                  os.path.abspath(filename), int(stat.st_mtime), stat.st_size,
+                  failed)
+
     def _ensure_dirs_exist(self):
         os.makedirs(self.thumbnail_dir, 0o700, exist_ok=True)
         os.makedirs(self.fail_dir, 0o700, exist_ok=True)
@@ -237,19 +698,25 @@ class ThumbnailStore(object):
         return int(os.path.getmtime(src))
 
     def _get_thumbnail_mtime(self, thumbnail_path):
-        pixbuf = Pixbuf.new_from_file(thumbnail_path)
-        mtime = pixbuf.get_options()["tEXt::" + self.KEY_MTIME]
-
-        return mtime
+        # Only the metadata is read, the thumbnail itself is not decoded
+        return read_png_text(thumbnail_path).get(self.KEY_MTIME)
 
     def _create_thumbnail(self, source_file, thumbnail_filename):
         # Cannot access source; create neither thumbnail nor fail file
         if not os.access(source_file, os.R_OK):
             return False
 
+        file_format = None
+        width = 0
+        height = 0
+        try:
+            file_format, width, height = \
+                GdkPixbuf.Pixbuf.get_file_info(source_file)
+        except IOError:
+            pass
+
         try:
-            image = Pixbuf.new_from_file_at_scale(source_file, self.thumb_size,
-                                                  self.thumb_size, True)
+            image = self._load_scaled(source_file, file_format, width, height)
             dest_path = self._get_thumbnail_path(thumbnail_filename)
             success = True
         except GError:
@@ -257,13 +724,6 @@ class ThumbnailStore(object):
             dest_path = self._get_fail_path(thumbnail_filename)
             success = False
 
-        width = 0
-        height = 0
-        try:
-            _, width, height = GdkPixbuf.Pixbuf.get_file_info(source_file)
-        except IOError:
-            pass
-
         options = {
             "tEXt::" + self.KEY_URI: str(self._get_source_uri(source_file)),
             "tEXt::" + self.KEY_MTIME: str(self._get_source_mtime(source_file)),
@@ -283,5 +743,27 @@ class ThumbnailStore(object):
         image.savev(tmp_filename, "png", list(options.keys()),
                     list(options.values()))
         os.replace(tmp_filename, dest_path)
+        self._add_to_index(source_file, thumbnail_filename, not success)
 
         return success
+
+    def _load_scaled(self, source_file, file_format, width, height):
+        """Return the source image scaled to the size of the thumbnails.
+
+        The exif preview of JPEGs is used if it is large enough and has the
+        aspect ratio of the image. Otherwise the image is loaded at the size of
+        the thumbnails, the JPEG loader then decodes at 1/2, 1/4 or 1/8 of the
+        resolution directly.
+        """
+        if file_format is not None and width and height \
+                and file_format.get_name() in self.PREVIEW_FORMATS:
+            preview = get_exif_preview(source_file, self.thumb_size)
+            if preview is not None:
+                ratio = width / height
+                preview_ratio = preview.get_width() / preview.get_height()
+                if abs(preview_ratio - ratio) \
+                        <= self.PREVIEW_ASPECT_TOLERANCE * ratio:
+                    return ThumbnailManager.scale_pixbuf(preview,
+                                                         self.thumb_size)
+        return Pixbuf.new_from_file_at_scale(source_file, self.thumb_size,
+                                             self.thumb_size, True)
@@ -0,0 +1,209 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Load thumbnails ordered by their distance to the visible region."""
+
+import itertools
+
+
+class ThumbnailScheduler(object):
+    """Schedule the loading of thumbnails by their position in the viewport.
+
+    Visible thumbnails are loaded first, then one page in scroll direction and
+    then the others within PRELOAD_PAGES pages ordered by their distance to the
+    visible region. Thumbnails further away are loaded once they come close
+    to the visible region. Only QUEUE_LENGTH thumbnails are queued at the same
+    time and the queue is refilled as they finish so changing the order when
+    scrolling, zooming or leaving thumbnail mode only touches a few jobs.
+    Jobs which already started are never cancelled when scrolling.
+
+    Attributes:
+        _callback: Function called with pixbuf and index of loaded thumbnails.
+        _direction: 1 if the view last scrolled down, -1 if it scrolled up.
+        _generation: Number of the current load, results of earlier loads are
+            dropped.
+        _jobs: Dictionary of queued thumbnails.
+            Key: Index; Item: Tuple of DecodeJob and the load arguments.
+        _manager: ThumbnailManager to load the thumbnails with.
+        _order: Iterator over indices in the order they should be loaded.
+        _paths: List of the paths of the current load.
+        _pending: Dictionary of thumbnails which were not queued yet.
+            Key: Index; Item: Tuple of path, ignore_cache and skip_current.
+        _size: Size to load the thumbnails at.
+        _total: Total number of thumbnails of the current load.
+        _visible: Tuple of the first and last visible index.
+    """
+
+    # Number of thumbnails queued at the same time
+    QUEUE_LENGTH = 32
+    # Number of pages before and after the visible region which are loaded
+    PRELOAD_PAGES = 2
+
+    def __init__(self, manager, callback):
+        """Initialize attributes.
+
+        Args:
+            manager: ThumbnailManager to load the thumbnails with.
+            callback: Function called with pixbuf and index of loaded
+                thumbnails.
+        """
+        self._callback = callback
+        self._direction = 1
+        self._generation = 0
+        self._jobs = {}
+        self._manager = manager
+        self._order = iter(())
+        self._paths = []
+        self._pending = {}
+        self._size = 0
+        self._total = 0
+        self._visible = (0, 0)
+
+    def load_all(self, paths, size, ignore_cache=False, visible=(0, 0),
+                 shown=()):
+        """Load thumbnails of all paths replacing any running load.
+
+        Args:
+            paths: List of paths to load thumbnails for.
+            size: Size to load the thumbnails at.
+            ignore_cache: If True, bypass the in-memory thumbnail cache.
+            visible: Tuple of the first and last visible index.
+            shown: Set of indices already showing their thumbnail at size.
+                They are only passed to the callback, with None instead of a
+                pixbuf, if the cached thumbnail is outdated.
+        """
+        self.cancel()
+        self._generation += 1
+        self._size = size
+        self._total = len(paths)
+        self._paths = paths
+        self._pending = {index: (path, ignore_cache, index in shown)
+                         for index, path in enumerate(paths)}
+        self.update_visible(*visible)
+
+    def load(self, index, path, ignore_cache=False):
+        """Load the thumbnail of a single path before all others.
+
+        Args:
+            index: Index of the thumbnail.
+            path: Path to load the thumbnail for.
+            ignore_cache: If True, bypass the in-memory thumbnail cache.
+        """
+        self._pending.pop(index, None)
+        if index in self._jobs:
+            self._jobs.pop(index)[0].cancel()
+        self._submit(index, path, ignore_cache, False)
+
+    def update_paths(self, paths, inserted):
+        """Follow changed paths without loading unchanged thumbnails again.
+
+        Thumbnails still to load keep their path at its new index, those of
+        removed paths are dropped and the inserted ones are added.
+
+        Args:
+            paths: List of the new paths.
+            inserted: Indices of the paths which were inserted.
+        """
+        indices = {path: index for index, path in enumerate(paths)}
+        remaining = list(self._pending.values())
+        remaining.extend(args for _, args in self._jobs.values())
+        self.cancel()
+        # Queued thumbnails may have moved, drop their results
+        self._generation += 1
+        self._total = len(paths)
+        self._paths = paths
+        self._pending = {indices[args[0]]: args for args in remaining
+                         if args[0] in indices}
+        for index in inserted:
+            self._pending[index] = (paths[index], False, False)
+        self.update_visible(*self._visible)
+
+    def update_visible(self, first, last):
+        """Reorder the thumbnails still to load for a new visible region.
+
+        Queued thumbnails which did not start yet are cancelled and loaded
+        again according to the new order. Running ones finish.
+
+        Args:
+            first: First visible index.
+            last: Last visible index.
+        """
+        if first != self._visible[0]:
+            self._direction = 1 if first > self._visible[0] else -1
+        self._visible = (first, last)
+        for index, (job, args) in list(self._jobs.items()):
+            if not job.started:
+                job.cancel()
+                self._pending[index] = args
+                del self._jobs[index]
+        self._order = self._get_order(first, last)
+        self._fill()
+
+    def unload(self, indices):
+        """Load thumbnails again once they come close to the visible region.
+
+        Used for thumbnails which were dropped after leaving the preloaded
+        region.
+
+        Args:
+            indices: Indices of the thumbnails.
+        """
+        for index in indices:
+            if index not in self._jobs and index < self._total:
+                self._pending[index] = (self._paths[index], False, False)
+
+    def get_range(self):
+        """Return the first and last index loaded around the visible region."""
+        first, last = self._visible
+        margin = self.PRELOAD_PAGES * (last - first + 1)
+        return max(0, first - margin), min(self._total - 1, last + margin)
+
+    def cancel(self):
+        """Stop loading all thumbnails."""
+        for job, _ in self._jobs.values():
+            job.cancel()
+        self._jobs = {}
+        self._pending = {}
+        self._order = iter(())
+
+    def __len__(self):
+        return len(self._jobs) + len(self._pending)
+
+    def _get_order(self, first, last):
+        """Yield indices in the order their thumbnails should be loaded."""
+        count = last - first + 1
+        if self._direction > 0:
+            ahead = range(last + 1, last + 1 + count)
+        else:
+            ahead = range(first - 1, first - 1 - count, -1)
+        # Alternate between both sides ordered by distance
+        start, end = self.get_range()
+        before = range(first - 1, start - 1, -1)
+        after = range(last + 1, end + 1)
+        rest = itertools.chain.from_iterable(
+            itertools.zip_longest(after, before))
+        for index in itertools.chain(range(first, last + 1), ahead, rest):
+            if index is not None and 0 <= index < self._total:
+                yield index
+
+    def _fill(self):
+        """Queue pending thumbnails until QUEUE_LENGTH are queued."""
+        while self._pending and len(self._jobs) < self.QUEUE_LENGTH:
+            index = next(self._order, None)
+            if index is None:
+                break
+            if index in self._pending:
+                self._submit(index, *self._pending.pop(index))
+
+    def _submit(self, index, path, ignore_cache, skip_current):
+        job = self._manager.get_thumbnail_at_scale_async(
+            path, self._size, self._on_loaded, (self._generation, index),
+            ignore_cache, skip_current=skip_current)
+        self._jobs[index] = (job, (path, ignore_cache, skip_current))
+
+    def _on_loaded(self, pixbuf, generation_index):
+        generation, index = generation_index
+        if generation != self._generation:
+            return
+        self._jobs.pop(index, None)
+        self._pending.pop(index, None)
+        self._callback(pixbuf, index)
+        self._fill()
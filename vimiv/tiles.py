@@ -0,0 +1,154 @@
+# vim: ft=python fileencoding=utf-8 sw=4 et sts=4
+"""Tile based rendering of very large images."""
+
+from gi.repository import Gdk, GdkPixbuf
+
+
+class TilePyramid(object):
+    """Multi-resolution tile pyramid of an image.
+
+    Level n of the pyramid is the image downscaled by 2**n. Levels are created
+    lazily when they are first needed. Tiles are square pieces of the image at
+    the current zoom level which are rendered from the smallest level that
+    still has enough resolution. Only tiles which intersect the requested
+    region are rendered and tiles leaving the visible region are evicted.
+    Images which are not zoomed very large are painted from a single cairo
+    surface of the level instead.
+
+    Attributes:
+        pixbuf: The full GdkPixbuf.Pixbuf at level 0.
+
+        _levels: List of the already created levels, starting with pixbuf.
+        _surface: Tuple of the level pixbuf and the cairo surface created from
+            it. Only the most recently used surface is kept.
+        _tiles: Dictionary of rendered tiles.
+            Key: Tuple of zoom, column and row; Item: Tuple of a boolean which
+            is True if the tile was rendered fast and GdkPixbuf.Pixbuf.
+    """
+
+    TILE_SIZE = 256
+
+    def __init__(self, pixbuf):
+        """Initialize attributes.
+
+        Args:
+            pixbuf: The full GdkPixbuf.Pixbuf to render.
+        """
+        self.pixbuf = pixbuf
+        self._levels = [pixbuf]
+        self._surface = (None, None)
+        self._tiles = {}
+
+    def get_surface(self, zoom):
+        """Return a cairo surface of the smallest level suitable for zoom.
+
+        The surface is created once and reused for every draw at zoom levels
+        using the same level of the pyramid.
+
+        Args:
+            zoom: Zoom factor relative to pixbuf.
+        Return:
+            Tuple of the cairo.ImageSurface and its scale relative to pixbuf.
+        """
+        pixbuf, level_scale = self._get_level(zoom)
+        if self._surface[0] is not pixbuf:
+            surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf, 1, None)
+            self._surface = (pixbuf, surface)
+        return self._surface[1], level_scale
+
+    def get_tiles(self, zoom, x, y, width, height, fast=False):
+        """Return the tiles which intersect a region of the zoomed image.
+
+        Args:
+            zoom: Zoom factor relative to pixbuf.
+            x, y, width, height: Region in coordinates of the zoomed image.
+            fast: If True, render missing tiles with nearest neighbour
+                interpolation. Tiles rendered fast are rendered again once
+                they are requested in high quality.
+        Return:
+            List of tuples containing x, y and the GdkPixbuf.Pixbuf of a tile.
+        """
+        tiles = []
+        for column, row in self._get_tile_indices(zoom, x, y, width, height):
+            key = (zoom, column, row)
+            if key not in self._tiles or self._tiles[key][0] and not fast:
+                self._tiles[key] = \
+                    (fast, self._render_tile(zoom, column, row, fast))
+            tile = self._tiles[key][1]
+            if tile:
+                tiles.append((column * self.TILE_SIZE, row * self.TILE_SIZE,
+                              tile))
+        return tiles
+
+    def evict(self, zoom, x, y, width, height):
+        """Remove all tiles which do not intersect the visible region.
+
+        Args:
+            zoom: Current zoom factor relative to pixbuf.
+            x, y, width, height: Visible region in coordinates of the zoomed
+                image.
+        """
+        visible = set(self._get_tile_indices(zoom, x, y, width, height))
+        for key in list(self._tiles.keys()):
+            if key[0] != zoom or key[1:] not in visible:
+                del self._tiles[key]
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def _get_tile_indices(self, zoom, x, y, width, height):
+        """Return column and row of all tiles intersecting a region."""
+        size = self.TILE_SIZE
+        max_column = (int(self.pixbuf.get_width() * zoom) - 1) // size
+        max_row = (int(self.pixbuf.get_height() * zoom) - 1) // size
+        first_column = max(0, int(x) // size)
+        last_column = min(max_column, int(x + width) // size)
+        first_row = max(0, int(y) // size)
+        last_row = min(max_row, int(y + height) // size)
+        return [(column, row)
+                for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
+
+    def _get_level(self, zoom):
+        """Return the smallest level with enough resolution for zoom.
+
+        Return:
+            Tuple of the pixbuf of the level and its scale relative to pixbuf.
+        """
+        level = 0
+        while 0.5 ** (level + 1) >= zoom:
+            level += 1
+        while len(self._levels) <= level:
+            previous = self._levels[-1]
+            width = previous.get_width() // 2
+            height = previous.get_height() // 2
+            # Too small to be divided further
+            if not width or not height:
+                break
+            self._levels.append(previous.scale_simple(
+                width, height, GdkPixbuf.InterpType.BILINEAR))
+        level = min(level, len(self._levels) - 1)
+        pixbuf = self._levels[level]
+        return pixbuf, pixbuf.get_width() / self.pixbuf.get_width()
+
+    def _render_tile(self, zoom, column, row, fast=False):
+        """Render a single tile of the zoomed image.
+
+        Return:
+            The tile as GdkPixbuf.Pixbuf or None if it is empty.
+        """
+        pixbuf, level_scale = self._get_level(zoom)
+        scale = zoom / level_scale
+        x = column * self.TILE_SIZE
+        y = row * self.TILE_SIZE
+        width = min(self.TILE_SIZE, int(pixbuf.get_width() * scale) - x)
+        height = min(self.TILE_SIZE, int(pixbuf.get_height() * scale) - y)
+        if width <= 0 or height <= 0:
+            return None
+        tile = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB,
+                                    pixbuf.get_has_alpha(), 8, width, height)
+        interpolation = GdkPixbuf.InterpType.NEAREST if fast \
+            else GdkPixbuf.InterpType.BILINEAR
+        pixbuf.scale(tile, 0, 0, width, height, -x, -y, scale, scale,
+                     interpolation)
+        return tile